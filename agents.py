@@ -1,7 +1,10 @@
 import random
 import time
+from array import array
 from heapq import heappop
 from heapq import heappush
+from threading import Condition, local
+from reservations import ReservationTable
 from utils import PositionManager as PosMan
 
 
@@ -10,100 +13,359 @@ class NoPathFoundException(Exception):
 
 
 class Agent:
+    __slots__ = ("id", "position", "target", "env", "end", "is_stuck")
+
     def __init__(self, id_, position, target, env):
         self.id = id_
         self.position = position
         self.target = target
         self.env = env
         self.end = False
-        self.stuck = False
+        self.is_stuck = False
+
+    @property
+    def stuck(self):
+        return self.is_stuck
+
+    @stuck.setter
+    def stuck(self, value):
+        if value != self.is_stuck and self.env.profiler is not None:
+            self.env.profiler.count("agent.stuck" if value else "agent.unstuck", 1, self.id)
+        self.is_stuck = value
+        if value:
+            self.env.stuck_agents.add(self)
+        else:
+            self.env.stuck_agents.discard(self)
 
     @staticmethod
-    def get_closer(source, target, n, get_neighbors):
+    def get_closer(source, target, n, get_neighbors, rng=random):
         closers = PosMan.get_closers_neighbors(source, target, n, get_neighbors)
         if closers:
-            return random.choice(closers)
+            return rng.choice(closers)
         else:
             raise NoPathFoundException
 
     @staticmethod
-    def get_farther(source, target, n, get_neighbors):
+    def get_farther(source, target, n, get_neighbors, rng=random):
         farthers = PosMan.get_closers_neighbors(source, target, n, get_neighbors)
         if farthers:
-            return random.choice(farthers)
+            return rng.choice(farthers)
         else:
             raise NoPathFoundException
 
     def move(self, source, target):
         pass
 
+    def step(self):
+        if not self.stuck:
+            try:
+                self.move(self.position, self.target)
+            except NoPathFoundException:
+                self.stuck = True
+        if self.position == self.target:
+            self.end = True
+
+    def done(self):
+        return self.end or self.env.stopped
+
+    def wake(self):
+        pass
+
+    def plan_changed(self, cell):
+        pass
+
     def run(self):
-        while not self.end:
+        while not self.done():
             time.sleep(0.2)
-            if not self.stuck:
-                try:
-                    self.move(self.position, self.target)
-                except NoPathFoundException:
-                    self.stuck = True
-            if self.position == self.target:
-                self.end = True
+            self.step()
 
     def __str__(self):
         return str(self.id)
 
 
 class SimpleAgent(Agent):
+    __slots__ = ()
+
     def __init__(self, id_, position, target, env):
         super().__init__(id_, position, target, env)
 
     def move(self, source, target):
-        closer = self.get_closer(self.position, self.target, self.env.n, self.env.get_neighbors)
+        if self.env.profiler is not None:
+            self.env.profiler.count("closers_neighbors.calls", 1, self.id)
+        closer = self.get_closer(self.position, self.target, self.env.n, self.env.get_neighbors, self.env.random)
         self.env.next_move(self, closer)
 
 
-class DijkstraAgent(Agent):
-    def __init__(self, id_, position, target, env):
-        super().__init__(id_, position, target, env)
+class AStar:
+    local = local()
 
-    @staticmethod
-    def dijkstra(source, target, get_neighbors):
-        prev = {}
-        graph = set()
-        distance = {source: 0}
-        to_use = [(0, source)]  # Couples (distance[node], node)
+    def __init__(self, n):
+        self.n = n
+        size = n * n
+        self.cost = array('i', [0]) * size
+        self.prev = array('i', [-1]) * size
+        self.seen = array('I', [0]) * size
+        self.closed = array('I', [0]) * size
+        self.generation = 0
+        self.expanded = 0
 
+    @staticmethod
+    def get(n):
+        finders = getattr(AStar.local, "finders", None)
+        if finders is None:
+            finders = AStar.local.finders = {}
+        if n not in finders:
+            finders[n] = AStar(n)
+        return finders[n]
+
+    def find(self, source, target, get_neighbors):
+        self.generation += 1
+        if self.generation == 0xFFFFFFFF:
+            size = self.n * self.n
+            self.seen = array('I', [0]) * size
+            self.closed = array('I', [0]) * size
+            self.generation = 1
+        generation = self.generation
+        cost, prev, seen, closed = self.cost, self.prev, self.seen, self.closed
+        heuristic = PosMan.get_distance_row(target, self.n)
+        self.expanded = 0
+
+        seen[source] = generation
+        cost[source] = 0
+        to_use = [(heuristic[source], 0, source)]  # Triplets (f, -distance[node], node)
         while to_use:
-            dist_node, node = heappop(to_use)
-            if node in graph:
+            _, neg_dist_node, node = heappop(to_use)
+            if closed[node] == generation:
                 continue
+            if node == target:
+                break
+            closed[node] = generation
+            self.expanded += 1
 
-            graph.add(node)
-
+            dist_neighbor = 1 - neg_dist_node
             for neighbor in get_neighbors(node):
-                if neighbor in graph:
+                if closed[neighbor] == generation:
                     continue
-                dist_neighbor = dist_node + 1
-                if neighbor not in distance or distance[neighbor] > dist_neighbor:
-                    distance[neighbor] = dist_neighbor
-                    heappush(to_use, (dist_neighbor, neighbor))
+                if seen[neighbor] != generation or cost[neighbor] > dist_neighbor:
+                    seen[neighbor] = generation
+                    cost[neighbor] = dist_neighbor
                     prev[neighbor] = node
+                    heappush(to_use, (dist_neighbor + heuristic[neighbor], -dist_neighbor, neighbor))
+        else:
+            raise NoPathFoundException
 
         path = [target]
         node = target
         while node != source:
-            if node in prev:
-                node = prev[node]
-            else:
-                raise NoPathFoundException
-            path.insert(0, node)
-
+            node = prev[node]
+            path.append(node)
+        path.reverse()
         return path
 
+
+class DijkstraAgent(Agent):
+    __slots__ = ("tracking",)
+
+    def __init__(self, id_, position, target, env):
+        super().__init__(id_, position, target, env)
+        self.tracking = False
+
+    def dijkstra(self, source, target, get_neighbors):
+        finder = AStar.get(self.env.n)
+        profiler = self.env.profiler
+        if profiler is None:
+            return finder.find(source, target, get_neighbors)
+        try:
+            return finder.find(source, target, get_neighbors)
+        finally:
+            profiler.count("dijkstra.calls", 1, self.id)
+            profiler.count("dijkstra.expanded", finder.expanded, self.id)
+
+    def next_step(self, source, target):
+        # Le champ de distances partagé, tenu à jour par l'environnement, donne le pas suivant en O(1)
+        fields = self.env.get_distance_fields()
+        if not self.tracking:
+            fields.track(self)
+            self.tracking = True
+        return fields.next_step(source, target)
+
+    def arrived(self, target):
+        if self.tracking:
+            self.env.distance_fields.release(self)
+            self.tracking = False
+
     def move(self, source, target):
-        path = self.dijkstra(source, target, self.env.get_neighbors)
-        if len(path) < 2:
+        pos = self.next_step(source, target)
+        if pos is None:
             raise NoPathFoundException
-        self.env.next_move(self, path[1])
+        if self.env.next_move(self, pos) and pos == target:
+            self.arrived(target)
+
+
+class CooperativeAgent(Agent):
+    # A* fenêtré dans l'espace (case, tick) : les WINDOW prochains pas sont réservés dans
+    # env.reservations et le plan est refait toutes les WINDOW // 2 étapes. Une case tenue par un agent
+    # au repos de moindre priorité peut être réservée : celui-ci la libère au lieu d'un GiveWay.
+    __slots__ = ("route", "route_start", "route_valid", "expanded")
+    WINDOW = 8
+    WINDOW_SNAPSHOT = 1 << 17  # Au-delà de ce nombre de cases, la copie de toute la grille coûte plus que la fenêtre
+
+    def __init__(self, id_, position, target, env):
+        super().__init__(id_, position, target, env)
+        if env.reservations is None:
+            env.reservations = ReservationTable(env.grid_size, self.WINDOW + 2)
+        self.route = []
+        self.route_start = 0
+        self.route_valid = False
+        self.expanded = 0
+
+    def claimed(self, pos, at):
+        table = self.env.reservations
+        for later in range(at + 1, table.base + table.depth):
+            owner = table.owner(pos, later)
+            if owner >= 0 and owner != self.id:
+                return True
+        return False
+
+    def blocked(self, pos, at, now, grid):
+        table = self.env.reservations
+        owner = table.owner(pos, at)
+        if owner >= 0 and owner != self.id:
+            return True
+        occupant = grid[pos]
+        if occupant < 0 or occupant == self.id:
+            return False
+        if at == now:
+            return True
+        if table.horizon(occupant) >= at:
+            return False
+        # Occupant au repos : il faut lui laisser un tick pour voir la réservation et partir
+        return at < now + 2 or not self.env.comes_after(occupant, self.id)
+
+    def space_time_search(self, source, target, tick, grid):
+        table = self.env.reservations
+        adjacency = self.env.adjacency
+        heuristic = PosMan.get_distance_row(target, self.env.n)
+        width = self.WINDOW + 1
+        prev = {source * width: -1}
+        best = -1
+        self.expanded = 0
+
+        to_use = [(heuristic[source], 0, source)]  # Triplets (f, tick relatif, case)
+        while to_use:
+            _, step, pos = heappop(to_use)
+            node = pos * width + step
+            if best < 0 or heuristic[pos] < heuristic[best // width] or \
+                    (heuristic[pos] == heuristic[best // width] and step < best % width):
+                if step == self.WINDOW or not self.claimed(pos, tick + step):
+                    best = node
+                    if pos == target:
+                        break
+            if step == self.WINDOW:
+                continue
+            self.expanded += 1
+            at = tick + step
+            owner = table.owner(pos, at + 1)
+            if (owner < 0 or owner == self.id) and node + 1 not in prev:
+                prev[node + 1] = node
+                heappush(to_use, (step + 1 + heuristic[pos], step + 1, pos))
+            for neighbor in adjacency[pos]:
+                next_node = neighbor * width + step + 1
+                if next_node in prev or self.blocked(neighbor, at, tick, grid) or \
+                        self.blocked(neighbor, at + 1, tick, grid):
+                    continue
+                prev[next_node] = node
+                heappush(to_use, (step + 1 + heuristic[neighbor], step + 1, neighbor))
+
+        route = []
+        node = best
+        while node >= 0:
+            route.append(node // width)
+            node = prev[node]
+        route.reverse()
+        return route
+
+    def window(self, source):
+        # Cases à au plus WINDOW pas de source, une range par ligne : les seules que la recherche peut lire
+        n = self.env.n
+        x, y = PosMan.pos_2D(source, n)
+        rows = []
+        for row in range(max(y - self.WINDOW, 0), min(y + self.WINDOW, n - 1) + 1):
+            reach = self.WINDOW - abs(row - y)
+            rows.append(range(row * n + max(x - reach, 0), row * n + min(x + reach, n - 1) + 1))
+        return rows
+
+    def plan_route(self, source, target, tick):
+        # Planifié sur un snapshot de la fenêtre, sans verrou ; renvoie la version qu'avait la première case du
+        # plan, que le commit du premier pas vérifie
+        rows = self.window(source) if self.env.grid_size > self.WINDOW_SNAPSHOT else None
+        _, grid, cell_versions = self.env.snapshot(rows)
+        table = self.env.reservations
+        with table.lock:
+            table.expire(tick)
+            self.route = self.space_time_search(source, target, tick, grid)
+            self.route_start = tick
+            table.reserve(self.id, tick, self.route)
+        self.route_valid = True
+        self.env.plan(self, self.route[1:])
+        if self.env.profiler is not None:
+            self.env.profiler.count("space_time.calls", 1, self.id)
+            self.env.profiler.count("space_time.expanded", self.expanded, self.id)
+        if len(self.route) > 1 and grid[self.route[1]] < 0:
+            return cell_versions[self.route[1]]
+        return None
+
+    def plan_changed(self, cell):
+        # Une case du plan vient d'être prise : le plan est refait au prochain pas si, planifié maintenant,
+        # blocked() l'aurait écartée
+        occupant = self.env.grid[cell]
+        if occupant < 0 or occupant == self.id:
+            return
+        route = self.route
+        now = self.env.tick
+        for step in range(1, len(route)):
+            at = self.route_start + step
+            if route[step] == cell and at >= now and self.env.reservations.horizon(occupant) < at and \
+                    (at < now + 2 or not self.env.comes_after(occupant, self.id)):
+                self.route_valid = False
+                return
+
+    def release(self):
+        with self.env.reservations.lock:
+            self.env.reservations.release(self.id)
+        self.env.plan(self, ())
+        self.route = []
+        self.route_valid = False
+
+    def move(self, source, target):
+        tick = self.env.tick
+        index = tick - self.route_start
+        if self.route_valid and 0 <= index < len(self.route) - 1 and index < self.WINDOW // 2 and \
+                self.route[index] == source:
+            pos = self.route[index + 1]
+            expected_version = None
+        elif source == target and not self.claimed(source, tick):
+            if self.route:
+                self.release()
+            return
+        else:
+            expected_version = self.plan_route(source, target, tick)
+            if len(self.route) < 2:
+                # Aucun plan sûr dans la fenêtre : on attend le prochain tick plutôt que de se déclarer bloqué
+                self.release()
+                return
+            pos = self.route[1]
+        if pos != source and not self.env.next_move(self, pos, expected_version):
+            # Le plan d'un autre agent n'a pas été tenu : on replanifiera au prochain tick
+            self.release()
+
+    def step(self):
+        super().step()
+        self.end = self.position == self.target
+
+    def done(self):
+        # Arrivé, l'agent reste attentif aux réservations posées sur sa case
+        return self.env.stopped
 
 
 class Message:
@@ -132,25 +394,55 @@ class LetsTurnMessage(Message):
 
 
 class Messenger:
+    # Les champs sont déclarés par la classe qui l'hérite : deux bases à __slots__ non vides ne se combinent pas.
+    # Un Messenger créé seul est un SlottedMessenger, qui les déclare
+    __slots__ = ()
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(SlottedMessenger if cls is Messenger else cls)
+
     def __init__(self, id_):
         self.id = id_
         self.handler = {}
         self.received_messages = {}
         self.handler[ACKMessage] = self.ack_handler
+        self.wakeup = Condition()
+        self.signaled = False
+        self.listener = None
 
     def receive(self, sender, message):
-        if sender in self.received_messages:
-            old_message = self.received_messages[sender]
-            if old_message.priority > message.priority:
+        with self.wakeup:
+            if sender in self.received_messages:
+                old_message = self.received_messages[sender]
+                if old_message.priority > message.priority:
+                    self.received_messages[sender] = message
+            else:
                 self.received_messages[sender] = message
-        else:
-            self.received_messages[sender] = message
+            self.signaled = True
+            self.wakeup.notify()
+        if self.listener is not None:
+            self.listener()
+
+    def wake(self):
+        with self.wakeup:
+            self.signaled = True
+            self.wakeup.notify()
+        if self.listener is not None:
+            self.listener()
+
+    def wait(self, timeout=None):
+        with self.wakeup:
+            if not self.signaled:
+                self.wakeup.wait(timeout)
+            self.signaled = False
 
     def handle_messages(self):
         if not self.received_messages:
             return
 
-        for sender, message in list(self.received_messages.items()):
+        with self.wakeup:
+            messages = list(self.received_messages.items())
+        for sender, message in messages:
             for msg_type in self.handler:
                 if isinstance(message, msg_type):
                     self.handler[msg_type](sender)
@@ -166,6 +458,10 @@ class Messenger:
         self.received_messages.pop(sender)
 
 
+class SlottedMessenger(Messenger):
+    __slots__ = ("id", "handler", "received_messages", "wakeup", "signaled", "listener")
+
+
 class Actuator:
     def __init__(self, agent):
         self.agent = agent
@@ -187,6 +483,17 @@ class DirectWayActuator(Actuator):
         return self.agent.move_or_send_give_way(source, target, self.agent.id)
 
 
+class DetourActuator(Actuator):
+    # Plateaux clairsemés : les tuiles arrivées ne forment pas un mur comme au taquin, on les contourne
+    # par les cases libres et on ne pousse les autres que faute de chemin
+    def do(self, source, target):
+        if source == target:
+            self.can_end = True
+            self.agent.arrived(target)
+            return True
+        return self.agent.move_or_detour(source, target)
+
+
 class N2Actuator(Actuator):
     def __init__(self, agent, target_bis):
         super().__init__(agent)
@@ -214,17 +521,24 @@ class N1Actuator(N2Actuator):
 
 
 class InteractiveAgent(DijkstraAgent, Messenger):
+    __slots__ = ("handler", "received_messages", "wakeup", "signaled", "listener", "is_waiting", "next", "actuator")
+    IDLE_TIMEOUT = 1.0  # Filet de sécurité : on revérifie l'état même sans notification
+    RETRY_DELAY = 0.01
+
     def __init__(self, id_, position, target, env):
         DijkstraAgent.__init__(self, id_, position, target, env)
         Messenger.__init__(self, id_)
         self.handler[GiveWayMessage] = self.give_way_handler
         self.handler[LetsTurnMessage] = self.lets_turn_handler
-        self.waiting = False
+        self.is_waiting = False
         self.next = 1
         self.actuator = self.create_actuator()
 
     def create_actuator(self):
         n = self.env.n
+        if self.env.blanks > 1:
+            # Les cases vides en surnombre suffisent à faire de la place : pas de fin de taquin en 2x2
+            return DetourActuator(self)
         target_2d = PosMan.pos_2D(self.id, n)
         if (target_2d[0] < n - 2 and target_2d[1] < n - 2) or (target_2d[0] == n-1 and target_2d[1] == n - 2):
             return DirectWayActuator(self)
@@ -248,31 +562,90 @@ class InteractiveAgent(DijkstraAgent, Messenger):
     def receive(self, sender, message):
         super().receive(sender, message)
 
+    @property
+    def waiting(self):
+        return self.is_waiting
+
+    @waiting.setter
+    def waiting(self, value):
+        if value != self.is_waiting and self.env.profiler is not None:
+            self.env.profiler.count("agent.waiting" if value else "agent.released", 1, self.id)
+        self.is_waiting = value
+        if value:
+            self.env.waiting_agents.add(self)
+        else:
+            self.env.waiting_agents.discard(self)
+
     def send(self, receiver, message):
+        if self.env.profiler is not None:
+            self.env.profiler.count("messages.sent." + type(message).__name__, 1, self.id)
+            if isinstance(message, GiveWayMessage):
+                self.env.profiler.observe("give_way.chain_length", len(message.chain), self.id)
         if isinstance(message, GiveWayMessage):
             self.waiting = True
-        super().send(receiver, message)
+        if self.env.outbox is not None:
+            self.env.outbox.append((self, receiver, message))
+        else:
+            super().send(receiver, message)
+
+    def handle_messages(self):
+        if self.env.profiler is not None:
+            for message in list(self.received_messages.values()):
+                self.env.profiler.count("messages.handled." + type(message).__name__, 1, self.id)
+        super().handle_messages()
 
     def move(self, source, target):
         did = self.actuator.do(source, target)
         if not did:
             raise NoPathFoundException
 
+    def step(self):
+        if self.received_messages:
+            self.handle_messages()
+        elif (not (self.stuck or self.waiting or self.end)) and self.env.is_active(self.id) \
+                and self.env.may_move(self.id):
+            try:
+                self.move(self.position, self.target)
+            except NoPathFoundException:
+                self.stuck = True
+        if self.actuator.can_end:
+            if self.position == self.target:
+                self.end = True
+                self.stuck = False
+            if not self.waiting and self.env.is_active(self.id):
+                self.env.end_turn(self)
+
+    wake = Messenger.wake
+
+    def done(self):
+        return self.env.stopped
+
+    def idle(self):
+        if self.waiting:
+            # En attente d'un ACK, les autres messages ne sont pas traités
+            return not any(isinstance(message, ACKMessage) for message in list(self.received_messages.values()))
+        if self.received_messages:
+            return False
+        if not self.env.is_active(self.id):
+            return True
+        return (self.stuck or self.end) and not self.actuator.can_end
+
     def run(self):
-        while True:
-            if self.received_messages:
-                self.handle_messages()
-            elif (not (self.stuck or self.waiting or self.end)) and self.env.activeAgent == self.id:
-                try:
-                    self.move(self.position, self.target)
-                except NoPathFoundException:
-                    self.stuck = True
-            if self.actuator.can_end:
-                if self.position == self.target:
-                    self.end = True
-                    self.stuck = False
-                if self.env.activeAgent == self.id and not self.waiting:
-                    self.env.activeAgent += self.next
+        delay = 0
+        while not self.done():
+            if self.idle():
+                self.wait(self.IDLE_TIMEOUT)
+            self.signaled = False
+            moves = self.env.moves
+            self.step()
+            if self.env.moves == moves and self.received_messages and not self.waiting:
+                # Messages laissés en attente sans effet sur le plateau : on ne les retente
+                # qu'après un changement du plateau, un nouveau message ou un délai croissant
+                delay = min(self.IDLE_TIMEOUT, delay * 2 or self.RETRY_DELAY)
+                self.env.watch(self)
+                self.wait(delay)
+            else:
+                delay = 0
 
     def ack_handler(self, sender):
         super().ack_handler(sender)
@@ -290,7 +663,10 @@ class InteractiveAgent(DijkstraAgent, Messenger):
 
         pos = message.chain[1]
         if self.env.is_empty(pos):
-            self.env.next_move(self, pos)
+            if self.env.next_move(self, pos) and self.end and self.env.blanks > 1:
+                # Tuile arrivée délogée sur un plateau clairsemé : elle reprendra son tour
+                self.end = False
+                self.actuator.can_end = False
             self.ack(sender)
         else:
             try:
@@ -311,43 +687,60 @@ class InteractiveAgent(DijkstraAgent, Messenger):
             try:
                 receiver = self.env.agents[pos]
                 if isinstance(receiver, Messenger) and receiver not in self.received_messages \
-                        and receiver.id > self.id:
+                        and self.env.comes_after(receiver.id, self.id) and self.env.may_push(receiver):
                     return self.send_give_way(receiver, self.id)
             except KeyError:
                 pass
             return False
 
+        if self.env.profiler is not None:
+            self.env.profiler.count("closers_neighbors.calls", 1, self.id)
         closers = PosMan.get_closers_neighbors(self.position, self.target, self.env.n, self.env.get_all_neighbors)
         old_pos = self.position
         self.do_for_empty_or_then_fill(closers, empty_handler, fill_handler)
         if old_pos != self.position:
             self.ack(sender)
 
-    def send_give_way(self, receiver, priority):
+    def can_push(self, agent, priority, displace=False):
+        # Tuile de moindre priorité ; avec displace, n'importe quelle tuile, même déjà arrivée ou délogée
+        # avant son tour
+        if not isinstance(agent, Messenger) or agent.id == self.id:
+            return False
+        if displace:
+            return True
+        return self.env.may_push(agent) and self.env.comes_after(agent.id, priority)
+
+    def send_give_way(self, receiver, priority, displace=False):
         def is_servant(pos):
             if pos in self.env.agents:
                 agent = self.env.agents[pos]
-                return isinstance(agent, Messenger) and agent not in self.received_messages \
-                       and agent.id > priority and agent.id != self.id
+                return agent not in self.received_messages and self.can_push(agent, priority, displace)
             else:
                 return True
 
         def get_neighbors(pos):
             return self.env.get_neighbors(pos, is_servant)
 
-        closers_empty = PosMan.get_closers_empty(receiver.position, self.env.n, self.env.is_empty)
-        closer_empty = random.choice(closers_empty)
-        try:
-            path = self.dijkstra(receiver.position, closer_empty, get_neighbors)
+        if self.env.profiler is not None:
+            self.env.profiler.count("closers_empty.calls", 1, self.id)
+        closers_empty = self.env.get_closers_empty(receiver.position)
+        closer_empty = self.env.random.choice(closers_empty)
+        # Sur un plateau clairsemé, les autres cases vides à égale distance servent si celle-ci est hors d'atteinte
+        for closer_empty in [closer_empty] + [pos for pos in closers_empty if pos != closer_empty]:
+            try:
+                path = self.dijkstra(receiver.position, closer_empty, get_neighbors)
+            except NoPathFoundException:
+                continue
             self.send(receiver, GiveWayMessage(path, priority))
             return True
-        except NoPathFoundException:
-            return False
+        return False
 
     def move_or_send_lets_turn(self, target):
-        if self.env.is_empty(target):
+        if self.env.is_empty(target) and self.env.may_enter(self.id, target):
             self.env.next_move(self, target)
             return True
+        if not self.env.is_leading(self.id):
+            return False
 
         try:
             receiver = self.env.agents[self.target]
@@ -368,33 +761,61 @@ class InteractiveAgent(DijkstraAgent, Messenger):
                 fill_positions.append(pos)
 
         while empty_positions:
-            i = random.randint(0, len(empty_positions) - 1)
+            i = self.env.random.randint(0, len(empty_positions) - 1)
             pos = empty_positions[i]
             if empty_handler(pos):
                 return True
             empty_positions.pop(i)
 
         while fill_positions:
-            i = random.randint(0, len(fill_positions) - 1)
+            i = self.env.random.randint(0, len(fill_positions) - 1)
             pos = fill_positions[i]
             if fill_handler(pos):
                 return True
             fill_positions.pop(i)
         return False
 
+    def move_or_detour(self, source, target):
+        pos = self.next_step(source, target)
+        if pos is not None:
+            return self.move_or_push([pos], self.id)
+        # Pas de chemin par les cases libres : plus court chemin à travers les tuiles qu'on peut pousser,
+        # puis en dernier recours à travers les tuiles arrivées qui l'enferment
+        for displace in (False, True):
+            def is_servant(cell):
+                agent = self.env.agents.get(cell)
+                return agent is None or self.can_push(agent, self.id, displace)
+
+            try:
+                path = self.dijkstra(source, target, lambda cell: self.env.get_neighbors(cell, is_servant))
+            except NoPathFoundException:
+                continue
+            # La tuile à pousser peut elle-même être enfermée par des tuiles arrivées
+            if self.move_or_push(path[1:2], self.id, displace):
+                return True
+        return False
+
     def move_or_send_give_way(self, source, target, priority):
+        if self.env.profiler is not None:
+            self.env.profiler.count("closers_neighbors.calls", 1, self.id)
+        closers = PosMan.get_closers_neighbors(source, target, self.env.n, self.env.get_all_neighbors)
+        return self.move_or_push(closers, priority)
+
+    def move_or_push(self, positions, priority, displace=False):
         def empty_handler(pos):
-            return self.env.next_move(self, pos)
+            return self.env.may_enter(self.id, pos) and self.env.next_move(self, pos)
 
         def fill_handler(pos):
+            # Seul le tour de plus haute priorité pousse les autres tuiles : les chaînes de
+            # GiveWay ne peuvent pas se bloquer mutuellement
+            if not self.env.is_leading(self.id):
+                return False
             try:
                 receiver = self.env.agents[pos]
-                if isinstance(receiver, Messenger) and receiver not in self.received_messages \
-                        and receiver.id > priority and receiver.id != self.id:
-                    return self.send_give_way(receiver, priority)
+                if receiver not in self.received_messages and self.can_push(receiver, priority, displace):
+                    return self.send_give_way(receiver, priority, displace)
             except KeyError:
                 pass
             return False
 
-        closers = PosMan.get_closers_neighbors(source, target, self.env.n, self.env.get_all_neighbors)
-        return self.do_for_empty_or_then_fill(closers, empty_handler, fill_handler)
+        return self.do_for_empty_or_then_fill(positions, empty_handler, fill_handler)
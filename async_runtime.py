@@ -0,0 +1,88 @@
+import asyncio
+import time
+from collections import deque
+from agents import Messenger
+
+
+class AsyncRuntime:
+    FINISH_POLL = 0.01
+
+    def __init__(self, env, step_delay=0.0):
+        self.env = env
+        self.step_delay = step_delay
+        self.loop = None
+        self.events = {}
+
+    async def wait(self, event, timeout):
+        if event.is_set():
+            return
+        handle = self.loop.call_later(timeout, event.set)
+        await event.wait()
+        handle.cancel()
+
+    async def deliver(self, sender, receiver, message):
+        Messenger.send(sender, receiver, message)
+        await asyncio.sleep(0)
+
+    async def flush(self):
+        # Les envois d'un pas sont mis en file par InteractiveAgent.send et remis ici, un await par message
+        outbox = self.env.outbox
+        while outbox:
+            await self.deliver(*outbox.popleft())
+
+    async def run_agent(self, agent):
+        env = self.env
+        if not isinstance(agent, Messenger):
+            while not agent.done():
+                agent.step()
+                await asyncio.sleep(self.step_delay)
+            return
+
+        # Même boucle que InteractiveAgent.run, les attentes bloquantes devenant des await
+        event = self.events[agent.id] = asyncio.Event()
+        agent.listener = event.set
+        delay = 0
+        try:
+            while not agent.done():
+                if agent.idle():
+                    await self.wait(event, agent.IDLE_TIMEOUT)
+                event.clear()
+                agent.signaled = False
+                moves = env.moves
+                agent.step()
+                await self.flush()
+                if env.moves == moves and agent.received_messages and not agent.waiting:
+                    delay = min(agent.IDLE_TIMEOUT, delay * 2 or agent.RETRY_DELAY)
+                    env.watch(agent)
+                    await self.wait(event, delay)
+                else:
+                    delay = 0
+                await asyncio.sleep(self.step_delay)
+        finally:
+            agent.listener = None
+
+    async def supervise(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.env.is_finish():
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            await asyncio.sleep(self.FINISH_POLL)
+        self.env.stopped = True
+        for event in self.events.values():
+            event.set()
+
+    async def main(self, timeout):
+        self.loop = asyncio.get_running_loop()
+        self.env.outbox = deque()
+        self.env.start_clock()
+        tasks = [asyncio.create_task(self.run_agent(agent)) for agent in list(self.env.by_id.values())]
+        await self.supervise(timeout)
+        await asyncio.gather(*tasks)
+
+    def run(self, timeout=None):
+        try:
+            asyncio.run(self.main(timeout))
+        finally:
+            self.env.outbox = None
+            self.env.clock = None
+        return self.env.moves
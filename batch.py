@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import random
+import time
+from multiprocessing import Pool
+from agents import SimpleAgent, DijkstraAgent, InteractiveAgent, CooperativeAgent
+from compact_agents import CompactAgent
+from environment import Environment
+from scheduler import Scheduler
+from solution_cache import SolutionCache
+from solver import Solver, UnsolvableException, SearchTimeoutException, BeamExhaustedException, random_board
+
+AGENTS = {"simple": SimpleAgent, "dijkstra": DijkstraAgent, "interactive": InteractiveAgent,
+          "cooperative": CooperativeAgent, "compact": CompactAgent}
+STRATEGIES = ["ida", "beam"] + list(AGENTS)
+
+solvers = {}
+beams = {}
+caches = {}
+table_bytes = 0  # Taille de la table de transpositions des solveurs IDA*, 0 sans table
+TABLE_STATS = ("probes", "hits", "misses", "stores", "replacements")
+
+
+def get_solver(n):
+    if n not in solvers:
+        solvers[n] = Solver(n, table_bytes=table_bytes)
+    return solvers[n]
+
+
+def get_beam(n):
+    if n not in beams:
+        from vectorized import BeamSearch  # NumPy n'est requis que pour cette stratégie
+        beams[n] = BeamSearch(n)
+    return beams[n]
+
+
+def get_cache(path):
+    # Une connexion par processus : elle ne doit pas traverser le fork du pool
+    if path not in caches:
+        caches[path] = SolutionCache(path)
+    return caches[path]
+
+
+def cache_strategy(strategy, max_steps, seed):
+    # Le résultat d'une simulation d'agents dépend aussi de la graine et du budget de ticks
+    if strategy in ("ida", "beam"):
+        return strategy
+    return "%s/%s/%s" % (strategy, seed, max_steps)
+
+
+def init_worker(sizes, table=0):
+    # Chaque processus charge ses tables d'heuristique une seule fois
+    global table_bytes
+    table_bytes = table
+    for n in sizes:
+        get_solver(n)
+
+
+def check_board(board, strategy):
+    # Tuiles distinctes de 0 à n*n-1 sur un carré, cases vides à -1 ; les solveurs ne prennent que le taquin complet
+    if not isinstance(board, (list, tuple)):
+        raise ValueError("board must be a list of tiles: %r" % (board,))
+    n = int(round(len(board) ** 0.5))
+    tiles = [tile for tile in board if tile != -1]
+    if n < 2 or n * n != len(board) or len(tiles) == len(board) or len(set(tiles)) != len(tiles) or \
+            not all(type(tile) is int and 0 <= tile < n * n for tile in tiles):
+        raise ValueError("board must hold distinct tiles 0..n*n-1 and at least one blank (-1): %r" % (board,))
+    if strategy in ("ida", "beam") and sorted(tiles) != list(range(n * n - 1)):
+        raise ValueError("%s only solves full boards (tiles 0..n*n-2, one blank): %r" % (strategy, board))
+    return n
+
+
+def solve_board(task):
+    id_, board, strategy, timeout, max_steps, seed, cache_path = task
+    result = {"id": id_, "n": None, "board": board, "strategy": strategy,
+              "moves": None, "length": None, "expanded": None}
+    start = time.perf_counter()
+    try:
+        n = result["n"] = check_board(board, strategy)
+    except ValueError as error:
+        # Un plateau mal formé n'interrompt pas le lot : il a sa ligne de résultat comme les autres
+        result.update(status="invalid", error=str(error), time=time.perf_counter() - start)
+        return result
+    cache = get_cache(cache_path) if cache_path else None
+    if seed is None and strategy not in ("ida", "beam"):
+        cache = None  # Simulation sans graine : son résultat ne vaut que pour cette exécution
+    if cache is not None:
+        cached = cache.get(board, cache_strategy(strategy, max_steps, seed))
+        if cached is not None:
+            result.update(cached, cached=True, time=time.perf_counter() - start)
+            return result
+    if strategy in ("ida", "beam"):
+        solver = get_solver(n) if strategy == "ida" else get_beam(n)
+        # La table sert à tous les plateaux du processus : le résultat garde la part de ce plateau
+        table = solver.transpositions if strategy == "ida" else None
+        before = table.stats() if table is not None else None
+        try:
+            moves = solver.solve(board, timeout)
+            result.update(status="solved", moves=moves, length=len(moves))
+        except SearchTimeoutException:
+            result["status"] = "timeout"
+        except UnsolvableException:
+            result["status"] = "unsolvable"
+        except BeamExhaustedException:
+            result["status"] = "exhausted"
+        result["expanded"] = solver.expanded
+        if table is not None:
+            after = table.stats()
+            result["table"] = {field: after[field] - before[field] for field in TABLE_STATS}
+    else:
+        env = Environment(n, headless=True, seed=seed)
+        env.populate(board, AGENTS[strategy])
+        Scheduler(env, seed=seed).run(max_steps, timeout)
+        if all(agent.position == agent.target for agent in env.by_id.values()):
+            result["status"] = "solved"
+        elif env.is_finish():
+            result["status"] = "stuck"
+        else:
+            result["status"] = "timeout"
+        result["length"] = env.moves
+    result["time"] = time.perf_counter() - start
+    if cache is not None and result["status"] not in ("timeout", "invalid"):
+        cache.put(board, cache_strategy(strategy, max_steps, seed),
+                  {field: result[field] for field in ("status", "moves", "length", "expanded")})
+    return result
+
+
+def read_boards(path):
+    with open(path) as file:
+        for i, line in enumerate(file):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                yield i, line  # Rejeté par check_board avec le reste des plateaux invalides
+                continue
+            if isinstance(data, dict):
+                id_, data = data.get("id", i), data.get("board")
+            else:
+                id_ = i
+            yield id_, tuple(data) if isinstance(data, list) else data
+
+
+def generate_boards(n, count, seed):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield i, random_board(n, rng)
+
+
+def read_done(path):
+    done = set()
+    if os.path.exists(path):
+        with open(path) as file:
+            for line in file:
+                try:
+                    done.add(json.loads(line)["id"])
+                except (ValueError, KeyError):
+                    pass  # Ligne tronquée par une interruption
+    return done
+
+
+def ends_with_newline(path):
+    with open(path, "rb") as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
+
+
+def run(boards, output, strategy="ida", processes=None, chunksize=4, timeout=None, max_steps=None, seed=None,
+        sizes=(), resume=False, cache=SolutionCache.PATH, table=0):
+    done = read_done(output) if resume else set()
+    tasks = ((id_, board, strategy, timeout, max_steps, seed, cache) for id_, board in boards if id_ not in done)
+    count = 0
+    with open(output, "a" if resume else "w") as file, \
+            Pool(processes, initializer=init_worker, initargs=(sizes if strategy == "ida" else (), table)) as pool:
+        if file.tell() and not ends_with_newline(output):
+            file.write("\n")  # La ligne tronquée reste isolée : le premier résultat repris ne s'y colle pas
+        for result in pool.imap_unordered(solve_board, tasks, chunksize):
+            file.write(json.dumps(result) + "\n")
+            file.flush()
+            count += 1
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Solve many boards on a process pool, streaming JSONL results")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--boards", help="JSONL file of boards (list, or object with 'board' and optional 'id')")
+    source.add_argument("--generate", type=int, metavar="COUNT", help="number of seeded random boards")
+    parser.add_argument("-n", type=int, default=4, help="board size for --generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategy", choices=STRATEGIES, default="ida")
+    parser.add_argument("--output", default="results.jsonl")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--chunksize", type=int, default=4)
+    parser.add_argument("--timeout", type=float, help="seconds per board")
+    parser.add_argument("--max-steps", type=int, default=10000, help="tick budget for agent strategies")
+    parser.add_argument("--resume", action="store_true", help="append to output, skipping boards already in it")
+    parser.add_argument("--cache", default=SolutionCache.PATH, help="persistent solution cache (sqlite)")
+    parser.add_argument("--no-cache", action="store_true", help="always solve, neither reading nor filling the cache")
+    parser.add_argument("--table-bytes", type=int, default=0,
+                        help="transposition table per IDA* solver, in bytes (4x4 and smaller; 0 disables it)")
+    args = parser.parse_args()
+
+    if args.boards:
+        boards = read_boards(args.boards)
+        sizes = ()
+    else:
+        boards = generate_boards(args.n, args.generate, args.seed)
+        sizes = (args.n,)
+    start = time.perf_counter()
+    count = run(boards, args.output, args.strategy, args.processes, args.chunksize, args.timeout, args.max_steps,
+                args.seed, sizes, args.resume, None if args.no_cache else args.cache, args.table_bytes)
+    print("%i boards in %.1fs" % (count, time.perf_counter() - start))
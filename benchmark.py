@@ -0,0 +1,174 @@
+import argparse
+import csv
+import json
+import random
+import time
+from collections import Counter
+from agents import SimpleAgent, DijkstraAgent, InteractiveAgent, CooperativeAgent
+from compact_agents import CompactAgent
+from async_runtime import AsyncRuntime
+from environment import Environment
+from instrumentation import Profiler
+from scheduler import Scheduler
+from solver import random_board, random_sparse_board
+from turns import SequentialTurns, RegionTurns
+
+AGENTS = {"simple": SimpleAgent, "dijkstra": DijkstraAgent, "interactive": InteractiveAgent,
+          "cooperative": CooperativeAgent, "compact": CompactAgent}
+RUNTIMES = ["scheduler", "async", "threads"]
+TURNS = {"sequential": SequentialTurns, "region": RegionTurns}
+FIELDS = ["agent", "n", "runs", "solved_rate", "stuck_rate", "deadlock_rate", "time", "moves", "moves_per_second",
+          "dijkstra_calls", "dijkstra_expanded", "field_builds", "field_repairs", "messages"]
+# DijkstraAgent avance par DistanceFields.next_step sans appeler dijkstra : ses colonnes dijkstra restent vides
+# plutôt qu'à 0, et ce sont les reconstructions et réparations de champs qui mesurent son travail
+FIELD_AGENTS = {"dijkstra"}
+
+
+def run_threads(env, timeout):
+    deadline = time.monotonic() + timeout
+    env.start_agent()
+    while not env.is_finish() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    env.stop_agent()
+
+
+def run_board(agent_class, n, board, seed, max_steps, runtime="scheduler", timeout=10.0, turns="sequential"):
+    env = Environment(n, headless=True, seed=seed)
+    env.populate(board, agent_class)
+    env.set_turns(TURNS[turns](env))
+    env.profiler = Profiler()
+
+    start = time.perf_counter()
+    if runtime == "async":
+        AsyncRuntime(env).run(timeout)
+    elif runtime == "threads":
+        run_threads(env, timeout)
+    else:
+        Scheduler(env, seed=seed).run(max_steps, timeout)
+    elapsed = time.perf_counter() - start
+
+    if all(agent.position == agent.target for agent in env.by_id.values()):
+        status = "solved"
+    elif env.is_finish():
+        status = "stuck"
+    else:
+        status = "deadlock"  # Budget épuisé sans que les agents ne s'arrêtent
+    counters = env.profiler.counters
+    messages = {name[len("messages.sent."):]: count for name, count in counters.items()
+                if name.startswith("messages.sent.")}
+    return {"status": status, "time": elapsed, "moves": env.moves, "dijkstra_calls": counters["dijkstra.calls"],
+            "dijkstra_expanded": counters["dijkstra.expanded"], "field_builds": counters["distance_fields.built"],
+            "field_repairs": counters["distance_fields.repaired"], "messages": messages,
+            "profile": env.profiler.profile()}
+
+
+def run_suite(sizes, boards, seed, max_steps, agents, runtime="scheduler", timeout=10.0, turns="sequential",
+              occupancy=None):
+    results = []
+    for n in sizes:
+        rng = random.Random("%i-%i" % (seed, n))
+        if occupancy is None:
+            board_set = [random_board(n, rng) for _ in range(boards)]
+        else:
+            board_set = [random_sparse_board(n, int(n * n * occupancy), rng) for _ in range(boards)]
+        for name in agents:
+            runs = [run_board(AGENTS[name], n, board, seed + i, max_steps, runtime, timeout, turns)
+                    for i, board in enumerate(board_set)]
+            statuses = Counter(run["status"] for run in runs)
+            messages = Counter()
+            timers = Counter()
+            for run in runs:
+                messages.update(run["messages"])
+                timers.update(run["profile"]["timers"])
+            elapsed = sum(run["time"] for run in runs)
+            moves = sum(run["moves"] for run in runs)
+            results.append({
+                "agent": name,
+                "n": n,
+                "runs": len(runs),
+                "solved_rate": statuses["solved"] / len(runs),
+                "stuck_rate": statuses["stuck"] / len(runs),
+                "deadlock_rate": statuses["deadlock"] / len(runs),
+                "time": elapsed,
+                "moves": moves,
+                "moves_per_second": moves / elapsed if elapsed else 0.0,
+                "dijkstra_calls": None if name in FIELD_AGENTS else sum(run["dijkstra_calls"] for run in runs),
+                "dijkstra_expanded": None if name in FIELD_AGENTS else sum(run["dijkstra_expanded"] for run in runs),
+                "field_builds": sum(run["field_builds"] for run in runs),
+                "field_repairs": sum(run["field_repairs"] for run in runs),
+                "messages": dict(messages),
+                "timers": dict(timers),
+            })
+            print("%-12s n=%-3i solved=%.0f%% time=%.2fs moves=%i" % (
+                name, n, 100 * results[-1]["solved_rate"], elapsed, moves))
+    return {"config": {"sizes": list(sizes), "boards": boards, "seed": seed, "max_steps": max_steps,
+                       "runtime": runtime, "timeout": timeout, "turns": turns, "occupancy": occupancy},
+            "results": results}
+
+
+def write_csv(report, path):
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, FIELDS)
+        writer.writeheader()
+        for result in report["results"]:
+            row = {field: result.get(field) for field in FIELDS}
+            row["messages"] = json.dumps(result["messages"], sort_keys=True)
+            writer.writerow(row)
+
+
+def compare(old, new):
+    old_results = {(result["agent"], result["n"]): result for result in old["results"]}
+    print("%-12s %-4s %12s %12s %12s %12s %10s" % ("agent", "n", "time", "moves", "dijkstra", "repairs", "solved"))
+    for result in new["results"]:
+        key = (result["agent"], result["n"])
+        if key not in old_results:
+            continue
+        before = old_results[key]
+
+        def delta(field):
+            # Colonne absente des anciens rapports, ou vide pour cet agent
+            if not before.get(field) or result.get(field) is None:
+                return "%12s" % "n/a"
+            return "%+11.1f%%" % (100.0 * (result[field] - before[field]) / before[field])
+
+        print("%-12s %-4i %s %s %s %s %+9.0f%%" % (
+            key[0], key[1], delta("time"), delta("moves"), delta("dijkstra_calls"), delta("field_repairs"),
+            100 * (result["solved_rate"] - before["solved_rate"])))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the agent strategies on seeded boards")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--sizes", default="3-10", help="range 'a-b' or comma separated sizes")
+    run_parser.add_argument("--boards", type=int, default=10, help="boards per size")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--max-steps", type=int, default=2000)
+    run_parser.add_argument("--agents", default=",".join(AGENTS))
+    run_parser.add_argument("--runtime", choices=RUNTIMES, default="scheduler")
+    run_parser.add_argument("--timeout", type=float, default=10.0, help="seconds per board")
+    run_parser.add_argument("--turns", choices=TURNS, default="sequential", help="turn order of InteractiveAgent")
+    run_parser.add_argument("--occupancy", type=float,
+                            help="fraction of cells holding an agent (sparse boards); full puzzles by default")
+    run_parser.add_argument("--output", default="benchmark.json")
+    run_parser.add_argument("--csv")
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        if "-" in args.sizes:
+            first, last = args.sizes.split("-")
+            sizes = range(int(first), int(last) + 1)
+        else:
+            sizes = [int(size) for size in args.sizes.split(",")]
+        report = run_suite(sizes, args.boards, args.seed, args.max_steps, args.agents.split(","), args.runtime,
+                           args.timeout, args.turns, args.occupancy)
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        if args.csv:
+            write_csv(report, args.csv)
+    else:
+        with open(args.old) as old_file, open(args.new) as new_file:
+            compare(json.load(old_file), json.load(new_file))
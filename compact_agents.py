@@ -0,0 +1,206 @@
+import argparse
+import gc
+import random
+import tracemalloc
+from array import array
+from operator import attrgetter
+from threading import Condition, Lock
+from types import MappingProxyType
+from agents import InteractiveAgent, ACKMessage, GiveWayMessage, LetsTurnMessage, DirectWayActuator, N2Actuator, \
+    N1Actuator, DetourActuator
+from environment import Environment
+from solver import random_board, random_sparse_board
+
+
+class AgentTable:
+    # État de tous les agents d'un plateau en tableaux typés indexés par identifiant. Les boîtes de
+    # réception n'existent que pour les agents qui ont du courrier, les Condition que pour les agents
+    # exécutés dans un thread.
+    ACTUATORS = (DirectWayActuator, N2Actuator, N1Actuator, DetourActuator)
+
+    def __init__(self, env):
+        size = env.grid_size
+        self.env = env
+        self.positions = array('i', [-1]) * size
+        self.targets = array('i', [-1]) * size
+        # Un octet par drapeau plutôt qu'un masque : des threads différents les écrivent sans verrou
+        self.ends = array('B', [0]) * size
+        self.stuck = array('B', [0]) * size
+        self.waiting = array('B', [0]) * size
+        self.signaled = array('B', [0]) * size
+        self.tracking = array('B', [0]) * size
+        self.can_end = array('B', [0]) * size
+        self.kinds = array('B', [0]) * size  # Indice de la classe d'actionneur dans ACTUATORS
+        self.targets_bis = array('i', [-1]) * size
+        self.masters = array('i', [-1]) * size
+        self.nexts = array('i', [1]) * size
+        self.inboxes = {}
+        self.wakeups = {}
+        self.listeners = {}
+        self.lock = Lock()
+
+    def add(self, id_, position, target):
+        self.positions[id_] = position
+        self.targets[id_] = target
+        self.ends[id_] = self.stuck[id_] = self.waiting[id_] = self.signaled[id_] = 0
+        self.tracking[id_] = self.can_end[id_] = 0
+        self.nexts[id_] = 1
+
+    def set_actuator(self, id_, actuator):
+        self.kinds[id_] = self.ACTUATORS.index(type(actuator))
+        self.targets_bis[id_] = getattr(actuator, "target_bis", -1)
+        self.masters[id_] = getattr(actuator, "master_id", -1)
+
+
+def column(name):
+    # Les drapeaux se lisent 0 ou 1, ce qui suffit aux tests de vérité du code des agents
+    values = attrgetter("table." + name)
+
+    def get(self):
+        return values(self)[self.id]
+
+    def set_(self, value):
+        values(self)[self.id] = value
+
+    return property(get, set_)
+
+
+class CompactActuator:
+    # Vue sur l'actionneur d'un agent : les méthodes do des actionneurs d'origine lisent ses attributs
+    __slots__ = ("agent",)
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    @property
+    def can_end(self):
+        return bool(self.agent.table.can_end[self.agent.id])
+
+    @can_end.setter
+    def can_end(self, value):
+        self.agent.table.can_end[self.agent.id] = value
+
+    @property
+    def target_bis(self):
+        return self.agent.table.targets_bis[self.agent.id]
+
+    @property
+    def master_id(self):
+        return self.agent.table.masters[self.agent.id]
+
+    def do(self, source, target):
+        return AgentTable.ACTUATORS[self.agent.table.kinds[self.agent.id]].do(self, source, target)
+
+
+class CompactAgent(InteractiveAgent):
+    # InteractiveAgent dont l'état vit dans l'AgentTable de l'environnement : l'objet n'est qu'une
+    # poignée (table, id, env), sans __dict__, que le reste du code manipule comme un agent ordinaire.
+    # Les autres cases héritées des __slots__ des agents restent vides, masquées par les colonnes.
+    __slots__ = ("table",)
+    HANDLERS = ((ACKMessage, "ack_handler"), (GiveWayMessage, "give_way_handler"),
+                (LetsTurnMessage, "lets_turn_handler"))
+    NO_MESSAGES = MappingProxyType({})
+
+    position = column("positions")
+    target = column("targets")
+    end = column("ends")
+    is_stuck = column("stuck")
+    is_waiting = column("waiting")
+    signaled = column("signaled")
+    tracking = column("tracking")
+    next = column("nexts")
+
+    def __init__(self, id_, position, target, env):
+        if env.agent_table is None:
+            env.agent_table = AgentTable(env)
+        self.table = env.agent_table
+        self.id = id_
+        self.env = env
+        self.table.add(id_, position, target)
+        self.table.set_actuator(id_, self.create_actuator())
+
+    @property
+    def actuator(self):
+        return CompactActuator(self)
+
+    @property
+    def handler(self):
+        return {message_type: getattr(self, name) for message_type, name in self.HANDLERS}
+
+    @property
+    def received_messages(self):
+        return self.table.inboxes.get(self.id, self.NO_MESSAGES)
+
+    @property
+    def wakeup(self):
+        return self.table.wakeups.get(self.id) or self.table.lock
+
+    @property
+    def listener(self):
+        return self.table.listeners.get(self.id)
+
+    @listener.setter
+    def listener(self, value):
+        if value is None:
+            self.table.listeners.pop(self.id, None)
+        else:
+            self.table.listeners[self.id] = value
+
+    def receive(self, sender, message):
+        wakeup = self.table.wakeups.get(self.id)
+        with wakeup or self.table.lock:
+            inbox = self.table.inboxes.setdefault(self.id, {})
+            if sender not in inbox or inbox[sender].priority > message.priority:
+                inbox[sender] = message
+            self.signaled = True
+            if wakeup is not None:
+                wakeup.notify()
+        listener = self.listener
+        if listener is not None:
+            listener()
+
+    def wake(self):
+        wakeup = self.table.wakeups.get(self.id)
+        with wakeup or self.table.lock:
+            self.signaled = True
+            if wakeup is not None:
+                wakeup.notify()
+        listener = self.listener
+        if listener is not None:
+            listener()
+
+    def handle_messages(self):
+        super().handle_messages()
+        with self.wakeup:
+            if not self.table.inboxes.get(self.id, True):
+                del self.table.inboxes[self.id]
+
+    def run(self):
+        self.table.wakeups[self.id] = Condition()
+        super().run()
+
+
+def measure(n, agent_class, occupancy=None, seed=0):
+    rng = random.Random(seed)
+    board = random_board(n, rng) if occupancy is None else random_sparse_board(n, int(n * n * occupancy), rng)
+    gc.collect()
+    tracemalloc.start()
+    env = Environment(n, headless=True, seed=seed)
+    base = tracemalloc.get_traced_memory()[0]
+    env.populate(board, agent_class)
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return used, len(env.by_id)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Memory taken by InteractiveAgent and CompactAgent populations")
+    parser.add_argument("sizes", nargs="*", type=int, default=[50, 100])
+    parser.add_argument("--occupancy", type=float, help="sparse boards instead of full puzzles")
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        for agent_class in (InteractiveAgent, CompactAgent):
+            used, count = measure(n, agent_class, args.occupancy)
+            print("n=%-4i %-16s %6i agents %9.1f KiB %7.0f B/agent" % (
+                n, agent_class.__name__, count, used / 1024, used / count))
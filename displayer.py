@@ -1,42 +1,55 @@
+from collections import deque
 from tkinter import *
-from PIL import Image, ImageTk
 import tkinter as tk
 from environment import Environment
+from tiles import slice_tiles
 from utils import PositionManager
 
 
 class Application(tk.Tk):
-    def __init__(self, env: Environment):
+    def __init__(self, env: Environment, max_fps=30, source=None):
         super().__init__()
         self.env = env
+        self.source = source
         self.width = 500
         self.height = 500
+        self.max_fps = max_fps
+        self.env.move_log = deque()
         self.create_window()
-        self.canvas_grid = []
+        self.canvas = Canvas(self, width=self.width, height=self.height, highlightthickness=0)
+        self.canvas.pack()
         self.images = []
+        self.items = {}
         self.init_image()
         self.load_image()
 
     def init_image(self):
-        for i in range(self.env.n*self.env.n-1):
-            img = ImageTk.PhotoImage(
-                Image.open("images/" + str(self.env.n) + "x" + str(self.env.n) + "/" + str(i) + ".png"))
-            self.images.append(img)
-            self.canvas_grid.append(Canvas(self, width=self.width / self.env.n, height=self.height / self.env.n))
-            self.canvas_grid[i].create_image(0, 0, anchor=NW, image=self.images[i])
+        for path in slice_tiles(self.source, self.env.n, self.width, self.height):
+            self.images.append(PhotoImage(file=path))
+        for pos, agent in list(self.env.agents.items()):
+            self.items[agent.id] = self.canvas.create_image(*self.tile_position(pos), anchor=NW,
+                                                            image=self.images[agent.id])
         print("fin_init")
 
     def create_window(self):
         self.title("The taquin")
-        self.geometry(str(self.width + self.env.n*4)+"x"+str(self.height + self.env.n*4)+"+0+0")
+        self.geometry(str(self.width)+"x"+str(self.height)+"+0+0")
+
+    def tile_position(self, pos):
+        pos = PositionManager.pos_2D(pos, self.env.n)
+        return pos[0] * self.width // self.env.n, pos[1] * self.height // self.env.n
 
     def load_image(self):
-        for i in range(self.env.n * self.env.n-1):
-            self.canvas_grid[i].grid_forget()
-        for i, agent in list(self.env.agents.items()):
-            pos = PositionManager.pos_2D(i, self.env.n)
-            self.canvas_grid[agent.id].grid(row=pos[1], column=pos[0])
-        self.update()
-        self.env.screen_updated = True
+        # Seules les tuiles déplacées depuis la dernière image sont repositionnées
+        self.draw_moves()
         if not self.env.is_finish():
-            self.after(0, self.load_image)
+            self.after(max(1, 1000 // self.max_fps), self.load_image)
+        else:
+            # Un déplacement validé entre la lecture du journal et la fin serait sinon perdu pour la dernière image
+            self.draw_moves()
+
+    def draw_moves(self):
+        move_log = self.env.move_log
+        while move_log:
+            id_, _, pos = move_log.popleft()
+            self.canvas.coords(self.items[id_], *self.tile_position(pos))
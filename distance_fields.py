@@ -0,0 +1,295 @@
+from array import array
+from collections import deque
+from heapq import heapify, heappop, heappush
+from utils import PositionManager
+
+
+class DistanceField:
+    # Distances vers une cible dans un rectangle du plateau, cases incohérentes (distance attendue) et leur
+    # file de priorité, agents inscrits et blocs de l'index spatial où le champ est rangé
+    __slots__ = ("target", "box", "dist", "pending", "heap", "users", "blocks")
+
+    def __init__(self, target, dist):
+        self.target = target
+        self.box = None
+        self.dist = dist
+        self.pending = {}
+        self.heap = []
+        self.users = []
+        self.blocks = ()
+
+
+class DistanceFields:
+    # Distance BFS de chaque case vers une cible, à travers les cases libres d'un rectangle qui contient
+    # la cible et ses agents. La cible compte toujours comme source, occupée ou non : un chemin s'y arrête
+    # sans la traverser. Un plus court chemin de longueur D entre la cible et un agent ne sort pas de
+    # l'ellipse de Manhattan de taille D : tant que le rectangle la contient, les distances lues par l'agent
+    # sont celles du plateau entier. Sinon, ou si le rectangle est devenu trop grand, le champ est
+    # reconstruit sur le rectangle ajusté.
+    #
+    # Chaque commit ne touche, sous le verrou, que les champs dont le rectangle contient la case prise ou la
+    # case libérée, retrouvés par un index de blocs. La réparation suit LPA* : une case est incohérente
+    # quand sa distance diffère de 1 + le minimum de ses voisins. Le commit range ces cases dans la file du
+    # champ ; l'agent qui le lit traite celles relevées derrière la case prise et abaissées autour de la case
+    # libérée par distance croissante, jusqu'à ce que son voisinage soit exact. Le reste attend dans la file.
+    UNREACHABLE = 0xFFFF
+    MARGIN = 4  # Cases ajoutées autour de l'ellipse quand le rectangle est refait
+    BLOCK = 8  # Côté d'un bloc de l'index spatial
+
+    def __init__(self, env):
+        self.env = env
+        self.unreachable = array('H', [self.UNREACHABLE]) * env.grid_size
+        self.coordinates = PositionManager.get_coordinates_table(env.n)
+        self.width = -(-env.n // self.BLOCK)
+        self.blocks = [set() for _ in range(self.width * self.width)]
+        self.fields = {}  # cible -> DistanceField
+
+    def track(self, agent):
+        with self.env.commit_lock:
+            field = self.fields.get(agent.target)
+            if field is None:
+                field = self.fields[agent.target] = DistanceField(agent.target, array('H', self.unreachable))
+            field.users.append(agent)
+            if field.box is None or not self.inside(field, agent.position):
+                self.build(field, self.MARGIN)
+            else:
+                self.settle(field, agent.position)
+
+    def release(self, agent):
+        with self.env.commit_lock:
+            field = self.fields[agent.target]
+            field.users.remove(agent)
+            if not field.users:
+                del self.fields[agent.target]
+                for block in field.blocks:
+                    self.blocks[block].discard(field)
+
+    def frame(self, field, slack):
+        # Rectangle englobant la cible et les agents inscrits, élargi de slack et borné au plateau
+        coordinates = self.coordinates
+        xs = [coordinates[field.target][0]]
+        ys = [coordinates[field.target][1]]
+        for agent in field.users:
+            x, y = coordinates[agent.position]
+            xs.append(x)
+            ys.append(y)
+        last = self.env.n - 1
+        return max(min(xs) - slack, 0), max(min(ys) - slack, 0), min(max(xs) + slack, last), \
+            min(max(ys) + slack, last)
+
+    def build(self, field, slack):
+        for block in field.blocks:
+            self.blocks[block].discard(field)
+        field.box = x0, y0, x1, y1 = self.frame(field, slack)
+        field.blocks = [by * self.width + bx for by in range(y0 // self.BLOCK, y1 // self.BLOCK + 1)
+                        for bx in range(x0 // self.BLOCK, x1 // self.BLOCK + 1)]
+        for block in field.blocks:
+            self.blocks[block].add(field)
+        field.pending.clear()
+        field.heap.clear()
+
+        grid = self.env.grid
+        adjacency = self.env.adjacency
+        coordinates = self.coordinates
+        dist = field.dist
+        dist[:] = self.unreachable
+        dist[field.target] = 0
+        queue = deque([field.target])
+        while queue:
+            cell = queue.popleft()
+            next_dist = dist[cell] + 1
+            for neighbor in adjacency[cell]:
+                if grid[neighbor] < 0 and dist[neighbor] > next_dist:
+                    x, y = coordinates[neighbor]
+                    if x0 <= x <= x1 and y0 <= y <= y1:
+                        dist[neighbor] = next_dist
+                        queue.append(neighbor)
+        self.count("distance_fields.built")
+
+    def inside(self, field, cell):
+        x, y = self.coordinates[cell]
+        x0, y0, x1, y1 = field.box
+        return x0 <= x <= x1 and y0 <= y <= y1
+
+    def block(self, cell):
+        x, y = self.coordinates[cell]
+        return y // self.BLOCK * self.width + x // self.BLOCK
+
+    def moved(self, source, dest):
+        # Appelé sous le verrou de commit, la grille déjà à jour : dest vient d'être prise, source libérée.
+        # Les cases rendues incohérentes entrent dans la file du champ, réparée quand un agent le lit
+        fields = self.blocks[self.block(dest)]
+        if self.block(source) != self.block(dest):
+            fields = fields | self.blocks[self.block(source)]
+        for field in fields:
+            self.update(field, dest)
+            self.update(field, source)
+
+    def update(self, field, cell):
+        # Une case est cohérente quand sa distance vaut 1 + le minimum de ses voisins ; hors du rectangle,
+        # elle reste à l'infini
+        if cell == field.target or not self.inside(field, cell):
+            return
+        dist = field.dist
+        expected = self.UNREACHABLE
+        if self.env.grid[cell] < 0:
+            for neighbor in self.env.adjacency[cell]:
+                if dist[neighbor] < expected:
+                    expected = dist[neighbor]
+            if expected < self.UNREACHABLE:
+                expected += 1
+        if expected != dist[cell]:
+            if field.pending.get(cell) != expected:
+                field.pending[cell] = expected
+                heappush(field.heap, (expected if expected < dist[cell] else dist[cell], cell))
+        elif field.pending:
+            field.pending.pop(cell, None)
+
+    def settle(self, field, pos):
+        # Traite les cases incohérentes par distance croissante tant qu'elles peuvent changer le meilleur
+        # voisin de pos : une case abaissée propage à ses voisins, une case relevée repart de l'infini.
+        # Même règle que update, déroulée ici : c'est la boucle qui porte le coût des commits
+        dist, pending, heap = field.dist, field.pending, field.heap
+        adjacency = self.env.adjacency
+        grid = self.env.grid
+        coordinates = self.coordinates
+        target = field.target
+        x0, y0, x1, y1 = field.box
+        unreachable = self.UNREACHABLE
+        around = adjacency[pos]
+        bound = min([dist[neighbor] for neighbor in around if grid[neighbor] < 0], default=unreachable)
+        changed = 0
+        while heap:
+            key, cell = heap[0]
+            if key > bound:
+                break
+            heappop(heap)
+            expected = pending.get(cell)
+            if expected is None:
+                continue
+            current = dist[cell]
+            if (expected if expected < current else current) != key:
+                continue  # Entrée périmée
+            del pending[cell]
+            changed += 1
+            if expected < current:
+                dist[cell] = expected
+                cells = adjacency[cell]
+            else:
+                dist[cell] = unreachable
+                cells = adjacency[cell] + (cell,)
+            for other in cells:
+                if other == target:
+                    continue
+                x, y = coordinates[other]
+                if not (x0 <= x <= x1 and y0 <= y <= y1):
+                    continue
+                expected = unreachable
+                if grid[other] < 0:
+                    for neighbor in adjacency[other]:
+                        if dist[neighbor] < expected:
+                            expected = dist[neighbor]
+                    if expected < unreachable:
+                        expected += 1
+                current = dist[other]
+                if expected != current:
+                    if pending.get(other) != expected:
+                        pending[other] = expected
+                        heappush(heap, (expected if expected < current else current, other))
+                elif pending:
+                    pending.pop(other, None)
+            if cell in around:
+                bound = min([dist[neighbor] for neighbor in around if grid[neighbor] < 0], default=unreachable)
+        if len(heap) > 2 * len(pending) + 64:
+            # Les entrées périmées s'accumulent derrière la borne : la file est refaite à partir des cases
+            heap[:] = [(min(expected, dist[cell]), cell) for cell, expected in pending.items()]
+            heapify(heap)
+        if changed:
+            self.count("distance_fields.repaired", changed)
+
+    def slack(self, field, pos, best_dist):
+        # Demi-excès de la distance de pos sur sa distance de Manhattan à la cible : l'ellipse qui contient
+        # ses plus courts chemins déborde d'autant du rectangle cible-pos
+        x, y = self.coordinates[pos]
+        target_x, target_y = self.coordinates[field.target]
+        return (best_dist + 1 - abs(x - target_x) - abs(y - target_y)) // 2
+
+    def covers(self, field, pos, best_dist):
+        # Vrai si les distances lues autour de pos sont celles du plateau entier
+        if not self.inside(field, pos):
+            return False
+        x0, y0, x1, y1 = field.box
+        last = self.env.n - 1
+        if x0 == 0 and y0 == 0 and x1 == last and y1 == last:
+            return True
+        if best_dist == self.UNREACHABLE:
+            # Hors d'atteinte dans le rectangle : c'est vrai sur le plateau entier si l'agent est cerné, ou si
+            # la cible ne touche aucune case du bord du rectangle et y est donc enfermée
+            grid = self.env.grid
+            return all(grid[neighbor] >= 0 for neighbor in self.env.adjacency[pos]) or self.enclosed(field)
+        needed = self.frame(field, self.slack(field, pos, best_dist))
+        return needed[0] >= x0 and needed[1] >= y0 and needed[2] <= x1 and needed[3] <= y1
+
+    def enclosed(self, field):
+        # Aucune case du bord intérieur du rectangle n'est atteinte depuis la cible
+        x0, y0, x1, y1 = field.box
+        n = self.env.n
+        edges = []
+        if x0 > 0:
+            edges.append(range(y0 * n + x0, y1 * n + x0 + 1, n))
+        if x1 < n - 1:
+            edges.append(range(y0 * n + x1, y1 * n + x1 + 1, n))
+        if y0 > 0:
+            edges.append(range(y0 * n + x0, y0 * n + x1 + 1))
+        if y1 < n - 1:
+            edges.append(range(y1 * n + x0, y1 * n + x1 + 1))
+        dist = field.dist
+        return all(dist[cell] == self.UNREACHABLE for edge in edges for cell in edge)
+
+    def oversized(self, field, pos, best_dist):
+        # Rectangle devenu quatre fois trop grand : les agents se sont rapprochés de la cible
+        if best_dist == self.UNREACHABLE:
+            return False
+        x0, y0, x1, y1 = field.box
+        needed = self.frame(field, self.slack(field, pos, best_dist))
+        margin = 2 * self.MARGIN + 1
+        return (x1 - x0 + 1) * (y1 - y0 + 1) > 4 * (needed[2] - needed[0] + margin) * (needed[3] - needed[1] + margin)
+
+    def count(self, name, value=1):
+        if self.env.profiler is not None:
+            self.env.profiler.count(name, value)
+
+    def next_step(self, pos, target):
+        # Voisin libre le plus proche de la cible, None si elle est occupée ou hors d'atteinte
+        if self.env.grid[target] >= 0:
+            return None
+        with self.env.commit_lock:
+            field = self.fields[target]
+            if field.pending and self.inside(field, pos):
+                self.settle(field, pos)
+            best, best_dist = self.best_neighbor(field, pos)
+            if self.covers(field, pos, best_dist) and not self.oversized(field, pos, best_dist):
+                return best
+            x0, y0, x1, y1 = field.box
+            if best_dist == self.UNREACHABLE or not self.inside(field, pos):
+                # Rien de sûr à lire dans le rectangle : il double au moins
+                slack = self.MARGIN + max(x1 - x0, y1 - y0) // 2
+            else:
+                slack = self.MARGIN + max(self.slack(field, pos, best_dist), 0)
+            while True:
+                self.build(field, slack)
+                best, best_dist = self.best_neighbor(field, pos)
+                if self.covers(field, pos, best_dist):
+                    return best
+                slack *= 2
+
+    def best_neighbor(self, field, pos):
+        grid = self.env.grid
+        dist = field.dist
+        best = None
+        best_dist = self.UNREACHABLE
+        for neighbor in self.env.adjacency[pos]:
+            if grid[neighbor] < 0 and dist[neighbor] < best_dist:
+                best = neighbor
+                best_dist = dist[neighbor]
+        return best, best_dist
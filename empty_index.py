@@ -0,0 +1,73 @@
+class EmptyIndex:
+    # Cases vides rangées par ligne en bitsets (entiers Python) : le bit x de rows[y] vaut 1 si la case
+    # (x, y) est libre. Une mise à jour touche un bit ; la recherche des cases vides les plus proches
+    # parcourt les lignes par distance croissante et s'arrête dès qu'elles ne peuvent plus faire mieux.
+    def __init__(self, n):
+        self.n = n
+        self.rows = [(1 << n) - 1] * n
+        self.count = n * n
+
+    def add(self, pos):
+        y, x = divmod(pos, self.n)
+        bit = 1 << x
+        if not self.rows[y] & bit:
+            self.rows[y] |= bit
+            self.count += 1
+
+    def remove(self, pos):
+        y, x = divmod(pos, self.n)
+        bit = 1 << x
+        if self.rows[y] & bit:
+            self.rows[y] ^= bit
+            self.count -= 1
+
+    def __contains__(self, pos):
+        y, x = divmod(pos, self.n)
+        return self.rows[y] >> x & 1 == 1
+
+    def nearest(self, pos):
+        # Toutes les cases vides à distance de Manhattan minimale de pos
+        n = self.n
+        rows = self.rows
+        y0, x0 = divmod(pos, n)
+        low_mask = (2 << x0) - 1
+        best = 2 * n
+        closers = []
+        for dy in range(n):
+            if dy > best:
+                break
+            for y in (y0 - dy, y0 + dy) if dy else (y0,):
+                if not 0 <= y < n or not rows[y]:
+                    continue
+                row = rows[y]
+                # Case vide la plus proche à gauche (x <= x0) et à droite (x >= x0) de la colonne x0
+                left = row & low_mask
+                right = row >> x0
+                xs = []
+                if left:
+                    xs.append(left.bit_length() - 1)
+                if right:
+                    x = x0 + (right & -right).bit_length() - 1
+                    if not xs or x != xs[0]:
+                        xs.append(x)
+                for x in xs:
+                    dist = dy + abs(x - x0)
+                    if dist < best:
+                        best = dist
+                        closers = [y * n + x]
+                    elif dist == best:
+                        closers.append(y * n + x)
+        return closers
+
+    def choice(self, rng):
+        # Case vide uniforme : le rang tiré est retrouvé en sautant des lignes entières
+        if not self.count:
+            raise IndexError("no empty cell")
+        rank = rng.randrange(self.count)
+        for y, row in enumerate(self.rows):
+            size = row.bit_count()
+            if rank < size:
+                for _ in range(rank):
+                    row &= row - 1
+                return y * self.n + (row & -row).bit_length() - 1
+            rank -= size
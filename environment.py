@@ -1,79 +1,309 @@
+from array import array
+from collections.abc import Mapping
 from threading import Lock, Thread
 import random
 import time
+from distance_fields import DistanceFields
+from empty_index import EmptyIndex
+from turns import SequentialTurns
+from utils import PositionManager
+
+
+class AgentsView(Mapping):
+    def __init__(self, env):
+        self.env = env
+
+    def __getitem__(self, pos):
+        if 0 <= pos < self.env.grid_size:
+            id_ = self.env.grid[pos]
+            if id_ >= 0:
+                return self.env.by_id[id_]
+        raise KeyError(pos)
+
+    def __contains__(self, pos):
+        return 0 <= pos < self.env.grid_size and self.env.grid[pos] >= 0
+
+    def __iter__(self):
+        for pos, id_ in enumerate(self.env.grid):
+            if id_ >= 0:
+                yield pos
+
+    def __len__(self):
+        return len(self.env.by_id)
+
+    def values(self):
+        return self.env.by_id.values()
+
 
 class Environment:
-    def __init__(self, n):
+    MOVE_DELAY = 0.1
+    TICK_DURATION = 0.01  # Durée d'un tick des runtimes sans Scheduler quand les déplacements ne sont pas rythmés
+
+    def __init__(self, n, headless=False, seed=None, move_delay=MOVE_DELAY, blanks=1):
         self.grid_size = n * n
         self.n = n
-        self.agents = {}
-        self.mutex_grid = []
+        self.blanks = blanks  # Plus d'une case vide : plateau clairsemé, sans la fin de taquin en 2x2
+        self.headless = headless
+        self.move_delay = move_delay
+        self.random = random.Random(seed)
+        self.moves = 0
+        self.grid = array('i', [-1]) * self.grid_size
+        self.empty = EmptyIndex(n)
+        self.by_id = {}
+        self.agents = AgentsView(self)
+        self.adjacency = PositionManager.get_neighbors_table(n)
+        self.commit_lock = Lock()
+        self.version = 0  # Impair pendant une écriture (seqlock)
+        self.cell_versions = array('I', [0]) * self.grid_size
+        self.plans = {}  # case -> agents dont le plan passe par elle
+        self.planned = {}  # id -> cases du plan
+        self.stuck_agents = set()
+        self.waiting_agents = set()
         self.threads = []
+        self.stopped = False
+        self.watchers = set()
         self.update = False
-        self.activeAgent = 0
-        self.screen_updated = False
-        for _ in range(self.grid_size):
-            self.mutex_grid.append(Lock())
+        self.turn_lock = Lock()
+        self.turns = SequentialTurns(self)
+        self.active_agents = {0}
+        self.distance_fields = None  # Créés par le premier agent qui s'y inscrit
+        self.reservations = None  # ReservationTable partagée, créée par le premier CooperativeAgent
+        self.agent_table = None  # AgentTable des CompactAgent, créée par le premier d'entre eux
+        self.move_log = None  # deque créée par un afficheur qui consomme les déplacements
+        self.listeners = []
+        self.outbox = None  # deque des messages à remettre, tenue par AsyncRuntime ; envoi direct sinon
+        self.tick = 0
+        self.clock = None  # (début, durée d'un tick) : sans Scheduler, le tick suit l'horloge
+        self.profiler = None
+
+    @property
+    def activeAgent(self):
+        return min(self.active_agents, key=self.turns.rank, default=None)
+
+    @activeAgent.setter
+    def activeAgent(self, id_):
+        self.start_turns([id_])
+
+    def set_turns(self, turns):
+        self.turns = turns
+        self.start_turns(turns.start())
+
+    def start_turns(self, ids):
+        with self.turn_lock:
+            self.active_agents = set(ids)
+        self.wake_turns(ids)
+
+    def wake_turns(self, ids):
+        for id_ in ids:
+            if id_ in self.by_id:
+                self.by_id[id_].wake()
+
+    def is_active(self, id_):
+        return id_ in self.active_agents
+
+    def comes_after(self, id_, priority):
+        return self.turns.rank(id_) > self.turns.rank(priority)
+
+    def is_leading(self, id_):
+        return id_ == self.activeAgent
+
+    def may_move(self, id_):
+        # Les tours secondaires se figent tant qu'une chaîne de GiveWay est en cours
+        return not self.waiting_agents or self.is_leading(id_)
+
+    def may_enter(self, id_, pos):
+        # Les cases voisines du tour principal lui sont laissées : sans cela une tuile secondaire
+        # reprendrait la case qu'elle vient de lui céder
+        leader = self.by_id.get(self.activeAgent)
+        return leader is None or id_ == leader.id or pos not in self.adjacency[leader.position]
+
+    def may_push(self, agent):
+        # Avec plusieurs tours actifs, une tuile arrivée n'est plus poussée : un couloir défairait le travail
+        # de l'autre. L'ordre séquentiel la pousse comme une autre
+        return not (agent.end and self.turns.PARALLEL)
+
+    def end_turn(self, agent):
+        with self.turn_lock:
+            if agent.id not in self.active_agents:
+                return
+            self.active_agents.discard(agent.id)
+            started = self.turns.end_turn(agent)
+            self.active_agents.update(started)
+            leader = self.by_id.get(self.activeAgent)
+        if self.turns.PARALLEL and leader is not None and leader.stuck:
+            # Bloqué faute de pouvoir pousser les autres tuiles, il le peut désormais
+            leader.stuck = False
+            started = started + [leader.id]
+        self.wake_turns(started)
 
     def add_agent(self, agent):
-        self.agents[agent.position] = agent
-        self.threads.append(Thread(target=agent.run, args=(), daemon=True, name="Agent-%i" % agent.id))
+        self.grid[agent.position] = agent.id
+        self.empty.remove(agent.position)
+        self.by_id[agent.id] = agent
+
+    def populate(self, board, agent_class):
+        self.blanks = board.count(-1)
+        for pos, tile in enumerate(board):
+            if tile >= 0:
+                self.add_agent(agent_class(tile, pos, tile, self))
+        # Le tour par défaut ({0}) n'existe pas sur un plateau clairsemé sans la tuile 0
+        self.start_turns(self.turns.start())
 
     def get_neighbors(self, pos, check=None):
         if check is None:
-            check = self.is_empty
-
-        neighbors = []
-        if pos // self.n > 0 and check(pos - self.n):
-            neighbors.append(pos - self.n)  # Nord
-        if pos % self.n < self.n - 1 and check(pos + 1):  # Est
-            neighbors.append(pos + 1)
-        if pos // self.n < self.n - 1 and check(pos + self.n):  # Sud
-            neighbors.append(pos + self.n)
-        if pos % self.n > 0 and check(pos - 1):  # Ouest
-            neighbors.append(pos - 1)
-        return neighbors
+            grid = self.grid
+            return [neighbor for neighbor in self.adjacency[pos] if grid[neighbor] < 0]
+        return [neighbor for neighbor in self.adjacency[pos] if check(neighbor)]
 
     def get_all_neighbors(self, pos):
-        return self.get_neighbors(pos, lambda _: True)
+        return list(self.adjacency[pos])
 
     def is_empty(self, pos):
-        for p in list(self.agents.keys()):
-            if p == pos:
-                return False
-        return True
+        return self.grid[pos] < 0
+
+    def get_closers_empty(self, pos):
+        return self.empty.nearest(pos)
 
-    def next_move(self, agent, pos):
-        while not self.screen_updated:
-            time.sleep(0.1)
-        self.mutex_grid[pos].acquire()
-        has_move = False
+    def next_move(self, agent, pos, expected_version=None):
+        if not self.headless and self.move_delay:
+            if self.profiler is not None:
+                start = time.perf_counter()
+                time.sleep(self.move_delay)
+                self.profiler.time("next_move.pacing", time.perf_counter() - start, agent.id)
+            else:
+                time.sleep(self.move_delay)
+        return self.commit(agent, agent.position, pos, expected_version)
+
+    def commit(self, agent, source, pos, expected_version=None):
+        profiler = self.profiler
+        if profiler is None:
+            self.commit_lock.acquire()
+        else:
+            start = time.perf_counter()
+            self.commit_lock.acquire()
+            profiler.time("commit.lock_wait", time.perf_counter() - start, agent.id)
         try:
-            if self.is_empty(pos):
-                self.agents.pop(agent.position)
-                agent.position = pos
-                self.agents[agent.position] = agent
-                has_move = True
+            if self.grid[pos] >= 0 or self.grid[source] != agent.id or agent.position != source:
+                if profiler is not None:
+                    profiler.count("commit.rejected", 1, agent.id)
+                return False
+            if expected_version is not None and self.cell_versions[pos] != expected_version:
+                if profiler is not None:
+                    profiler.count("commit.rejected", 1, agent.id)
+                return False
+            self.version += 1
+            self.grid[source] = -1
+            agent.position = pos
+            self.grid[pos] = agent.id
+            self.empty.add(source)
+            self.empty.remove(pos)
+            self.cell_versions[source] += 1
+            self.cell_versions[pos] += 1
+            self.version += 1
+            self.moves += 1
+            if self.distance_fields is not None:
+                self.distance_fields.moved(source, pos)
+            if self.clock is not None:
+                start, duration = self.clock
+                self.tick = int((time.monotonic() - start) / duration)
+            for listener in self.listeners:
+                listener(self.tick, agent.id, source, pos)
+            # Seuls les agents dont le plan passe par l'une des deux cases sont prévenus
+            changed = [(cell, tuple(self.plans[cell])) for cell in (source, pos) if cell in self.plans]
         finally:
-            self.screen_updated = False
-            self.mutex_grid[pos].release()
-        if has_move:
-            self.update = True
-            for agent in list(self.agents.values()):
-                agent.stuck = False
+            self.commit_lock.release()
+        if profiler is not None:
+            profiler.count("commit.applied", 1, agent.id)
+        self.update = True
+        if self.move_log is not None:
+            self.move_log.append((agent.id, source, pos))
+        for cell, planners in changed:
+            for planner in planners:
+                if planner is not agent:
+                    planner.plan_changed(cell)
+        stuck, self.stuck_agents = self.stuck_agents, set()
+        for other in stuck:
+            other.is_stuck = False
+            if profiler is not None:
+                profiler.count("agent.unstuck", 1, other.id)
+            other.wake()
+        watchers, self.watchers = self.watchers, set()
+        for other in watchers:
+            other.wake()
+        return True
 
-        return has_move
+    def get_distance_fields(self):
+        if self.distance_fields is None:
+            with self.commit_lock:
+                if self.distance_fields is None:
+                    self.distance_fields = DistanceFields(self)
+        return self.distance_fields
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def snapshot(self, rows=None):
+        # Copie cohérente de la grille et des versions de cases, sans prendre le verrou de commit. Avec rows
+        # (des range de cases), seules ces cases sont copiées, dans des dictionnaires case -> valeur
+        while True:
+            version = self.version
+            if not version & 1:
+                if rows is None:
+                    grid = self.grid[:]
+                    cell_versions = self.cell_versions[:]
+                else:
+                    grid = {cell: self.grid[cell] for cells in rows for cell in cells}
+                    cell_versions = {cell: self.cell_versions[cell] for cells in rows for cell in cells}
+                if self.version == version:
+                    return version, grid, cell_versions
+            time.sleep(0)
+
+    def plan(self, agent, cells):
+        with self.commit_lock:
+            for cell in self.planned.pop(agent.id, ()):
+                planners = self.plans[cell]
+                planners.discard(agent)
+                if not planners:
+                    del self.plans[cell]
+            if cells:
+                cells = frozenset(cells)
+                self.planned[agent.id] = cells
+                for cell in cells:
+                    self.plans.setdefault(cell, set()).add(agent)
+
+    def watch(self, agent):
+        self.watchers.add(agent)
+
+    def start_clock(self):
+        # Threads et AsyncRuntime n'ont pas de Scheduler pour avancer env.tick : les enregistrements de trace
+        # sont datés par l'horloge, en ticks d'une durée de déplacement
+        duration = self.move_delay if not self.headless and self.move_delay else self.TICK_DURATION
+        self.clock = (time.monotonic() - self.tick * duration, duration)
 
     def start_agent(self):
-        for thread in self.threads:
+        self.start_clock()
+        for agent in self.by_id.values():
+            thread = Thread(target=agent.run, args=(), daemon=True, name="Agent-%i" % agent.id)
+            self.threads.append(thread)
             thread.start()
 
+    def stop_agent(self):
+        self.stopped = True
+        for agent in list(self.by_id.values()):
+            agent.wake()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.clock = None
+
     def generate_random_position(self):
-        empty_grid = list(filter(self.is_empty, range(self.grid_size)))
-        return random.choice(empty_grid)
+        return self.empty.choice(self.random)
 
     def is_finish(self):
-        for agent in list(self.agents.values()):
+        for agent in list(self.by_id.values()):
             if not (agent.end or agent.stuck):
                 return False
         return True
@@ -85,12 +315,12 @@ class Environment:
         for i in range(self.grid_size):
             if i % self.n == 0:
                 str_ += "\n"
-            if self.is_empty(i):
+            if self.grid[i] < 0:
                 str_ += "__ "
             else:
-                if self.agents[i].id < 10:
+                if self.grid[i] < 10:
                     str_ += " "
-                str_ += str(self.agents[i].id) + " "
+                str_ += str(self.grid[i]) + " "
         str_ += "\n"
         for i in range(self.n):
             str_ += "#  "
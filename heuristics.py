@@ -0,0 +1,140 @@
+import warnings
+from pattern_database import PatternDatabase
+from utils import PositionManager as PosMan
+
+
+class Heuristic:
+    def evaluate(self, board):
+        raise NotImplementedError
+
+    def move(self, board, tile, source, target, h):
+        # board est déjà à jour : tile est passée de source à target
+        return self.evaluate(board)
+
+    def undo(self):
+        pass
+
+
+class LinearConflictHeuristic(Heuristic):
+    def __init__(self, n):
+        self.n = n
+        size = n * n
+        table = PosMan.get_distance_table(n)
+        self.distances = [tuple(table[goal * size:(goal + 1) * size]) for goal in range(size)]
+        self.row_conflicts = [{} for _ in range(n)]
+        self.col_conflicts = [{} for _ in range(n)]
+        self.rows = [0] * n
+        self.cols = [0] * n
+        self.history = []
+
+    @staticmethod
+    def conflicts(line):
+        # 2 * (tuiles à sortir de la ligne pour que les autres soient dans l'ordre)
+        longest = [1] * len(line)
+        for i in range(len(line)):
+            for j in range(i):
+                if line[j] < line[i] and longest[j] + 1 > longest[i]:
+                    longest[i] = longest[j] + 1
+        return 2 * (len(line) - max(longest, default=0))
+
+    def row_value(self, board, row):
+        n = self.n
+        line = tuple(board[row * n:(row + 1) * n])
+        cache = self.row_conflicts[row]
+        if line not in cache:
+            cache[line] = self.conflicts([tile % n for tile in line if tile >= 0 and tile // n == row])
+        return cache[line]
+
+    def col_value(self, board, col):
+        n = self.n
+        line = tuple(board[col::n])
+        cache = self.col_conflicts[col]
+        if line not in cache:
+            cache[line] = self.conflicts([tile // n for tile in line if tile >= 0 and tile % n == col])
+        return cache[line]
+
+    def evaluate(self, board):
+        n = self.n
+        self.history = []
+        self.rows = [self.row_value(board, row) for row in range(n)]
+        self.cols = [self.col_value(board, col) for col in range(n)]
+        manhattan = sum(self.distances[tile][pos] for pos, tile in enumerate(board) if tile >= 0)
+        return manhattan + sum(self.rows) + sum(self.cols)
+
+    def move(self, board, tile, source, target, h):
+        # board est déjà à jour : tile est passée de source à target
+        n = self.n
+        h += self.distances[tile][target] - self.distances[tile][source]
+        if source - target == 1 or target - source == 1:
+            lines, first, second = self.cols, source % n, target % n
+            new_first, new_second = self.col_value(board, first), self.col_value(board, second)
+        else:
+            lines, first, second = self.rows, source // n, target // n
+            new_first, new_second = self.row_value(board, first), self.row_value(board, second)
+        self.history.append((lines, first, lines[first], second, lines[second]))
+        h += new_first - lines[first] + new_second - lines[second]
+        lines[first] = new_first
+        lines[second] = new_second
+        return h
+
+    def undo(self):
+        lines, first, old_first, second, old_second = self.history.pop()
+        lines[first] = old_first
+        lines[second] = old_second
+
+
+class PatternDatabaseHeuristic(Heuristic):
+    def __init__(self, n, databases):
+        self.n = n
+        self.databases = databases
+        self.group = {}
+        self.slot = {}
+        for i, database in enumerate(databases):
+            for j, tile in enumerate(database.tiles):
+                self.group[tile] = i
+                self.slot[tile] = j
+        self.positions = [[0] * len(database.tiles) for database in databases]
+        self.values = [0] * len(databases)
+        self.history = []
+
+    @staticmethod
+    def load(n, partition=None, directory=PatternDatabase.DIRECTORY):
+        if partition is None:
+            partition = PatternDatabase.PARTITIONS[n]
+        return PatternDatabaseHeuristic(n, [PatternDatabase.open(n, tiles, directory) for tiles in partition])
+
+    def evaluate(self, board):
+        self.history = []
+        for pos, tile in enumerate(board):
+            if tile >= 0:
+                self.positions[self.group[tile]][self.slot[tile]] = pos
+        for i, database in enumerate(self.databases):
+            self.values[i] = database.lookup(self.positions[i])
+        return sum(self.values)
+
+    def move(self, board, tile, source, target, h):
+        i = self.group[tile]
+        positions = self.positions[i]
+        positions[self.slot[tile]] = target
+        value = self.databases[i].lookup(positions)
+        self.history.append((i, tile, source, self.values[i]))
+        h += value - self.values[i]
+        self.values[i] = value
+        return h
+
+    def undo(self):
+        i, tile, source, value = self.history.pop()
+        self.positions[i][self.slot[tile]] = source
+        self.values[i] = value
+
+
+def default_heuristic(n):
+    if n not in PatternDatabase.PARTITIONS:
+        return LinearConflictHeuristic(n)
+    try:
+        return PatternDatabaseHeuristic.load(n)
+    except FileNotFoundError as error:
+        # Sans les tables, un 4x4 difficile prend plus d'une minute au lieu de 8 à 11 s en moyenne
+        warnings.warn("pattern databases for %ix%i not found (%s): falling back to linear conflict, "
+                      "build them with 'python pattern_database.py %i'" % (n, n, error.filename, n), stacklevel=2)
+        return LinearConflictHeuristic(n)
@@ -0,0 +1,55 @@
+import json
+from collections import Counter, defaultdict
+from threading import Lock
+
+
+class Profiler:
+    def __init__(self):
+        self.lock = Lock()
+        self.counters = Counter()
+        self.timers = defaultdict(float)
+        self.histograms = defaultdict(Counter)
+        self.agents = defaultdict(Counter)
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def publish(self, name, value, agent_id):
+        for callback in self.subscribers:
+            callback(name, value, agent_id)
+
+    def count(self, name, value=1, agent_id=None):
+        with self.lock:
+            self.counters[name] += value
+            if agent_id is not None:
+                self.agents[agent_id][name] += value
+        self.publish(name, value, agent_id)
+
+    def time(self, name, seconds, agent_id=None):
+        with self.lock:
+            self.counters[name] += 1
+            self.timers[name] += seconds
+        self.publish(name, seconds, agent_id)
+
+    def observe(self, name, value, agent_id=None):
+        with self.lock:
+            self.histograms[name][value] += 1
+        self.publish(name, value, agent_id)
+
+    def profile(self):
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "timers": dict(self.timers),
+                "histograms": {name: {str(value): count for value, count in sorted(histogram.items())}
+                               for name, histogram in self.histograms.items()},
+                "agents": {str(agent_id): dict(counters) for agent_id, counters in sorted(self.agents.items())},
+            }
+
+    def dump(self, path):
+        with open(path, "w") as file:
+            json.dump(self.profile(), file, indent=2)
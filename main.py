@@ -1,20 +1,43 @@
 from environment import Environment
 from agents import SimpleAgent, DijkstraAgent, InteractiveAgent, Messenger, ACKMessage, GiveWayMessage
-from displayer import Application
-from PIL import Image, ImageTk
+from instrumentation import Profiler
+from move_trace import TraceWriter
+from scheduler import Scheduler
+from turns import SequentialTurns, RegionTurns
 
 N = 4
+AGENTS = N * N - 1  # Moins d'agents : plateau clairsemé, sans la fin de taquin en 2x2
+HEADLESS = False
+SEED = None
+MAX_STEPS = 10000
+TURNS = SequentialTurns  # RegionTurns : lignes et colonnes de chaque couche en parallèle
+PROFILE = None  # Chemin du profil JSON écrit en fin d'exécution
+TRACE = None  # Chemin de la trace binaire des déplacements, relue par move_trace.py
 #
 if __name__ == '__main__':
-    env = Environment(N)
-    for i in range(N*N-1):
+    env = Environment(N, headless=HEADLESS, seed=SEED, blanks=N * N - AGENTS)
+    if PROFILE:
+        env.profiler = Profiler()
+    for i in range(AGENTS):
         # env.add_agent(SimpleAgent(i, env.generate_random_position(), i, env))
         #env.add_agent(DijkstraAgent(i, env.generate_random_position(), i, env))
         env.add_agent(InteractiveAgent(i, env.generate_random_position(), i, env))
+    env.set_turns(TURNS(env))
+    if TRACE:
+        trace = TraceWriter(env, TRACE)
 
-    app = Application(env)
-    env.start_agent()
-    app.mainloop()
+    if HEADLESS:
+        Scheduler(env, seed=SEED).run(MAX_STEPS)
+        print(env)
+    else:
+        from displayer import Application  # tkinter et PIL ne sont chargés que pour l'affichage
+        app = Application(env)
+        env.start_agent()
+        app.mainloop()
+    if TRACE:
+        trace.close()
+    if PROFILE:
+        env.profiler.dump(PROFILE)
 
 
 
@@ -0,0 +1,181 @@
+import argparse
+import mmap
+import struct
+import time
+from threading import Event, Lock, Thread
+from agents import Agent
+from environment import Environment
+
+HEADER = struct.Struct("<4sHH")  # Signature, version, n
+RECORD = struct.Struct("<IiII")  # Tick, agent, départ, arrivée : cases sur 32 bits, au-delà de 255x255
+KEYFRAME = struct.Struct("<IQ")  # Tick, nombre d'enregistrements déjà appliqués, puis le plateau en int32
+TRACE_MAGIC = b"TQTR"
+KEYFRAME_MAGIC = b"TQKF"
+VERSION = 1
+
+
+class TraceWriter:
+    # Les enregistrements s'accumulent sous le verrou de commit ; un thread les écrit hors du verrou dès que le
+    # tampon dépasse buffer_size
+    def __init__(self, env, path, keyframe_interval=1024, buffer_size=1 << 16):
+        self.env = env
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.buffer_size = buffer_size
+        self.count = 0
+        self.buffer = bytearray()
+        self.keyframes = bytearray()
+        # Les en-têtes sont sur disque avant le premier enregistrement : une trace interrompue reste lisible
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(TRACE_MAGIC, VERSION, env.n))
+        self.file.flush()
+        self.keyframe_file = open(path + ".kf", "wb")
+        self.keyframe_file.write(HEADER.pack(KEYFRAME_MAGIC, VERSION, env.n))
+        self.keyframe_file.flush()
+        self.write_lock = Lock()
+        self.full = Event()
+        self.closed = False
+        self.writer = Thread(target=self.write, daemon=True, name="TraceWriter")
+        self.writer.start()
+        with env.commit_lock:
+            self.keyframe(env.tick)
+            env.subscribe(self.record)
+
+    def keyframe(self, tick):
+        self.keyframes += KEYFRAME.pack(tick, self.count)
+        self.keyframes += self.env.grid.tobytes()
+
+    def record(self, tick, agent_id, source, pos):
+        # Appelé sous le verrou de commit, le plateau est donc cohérent avec l'enregistrement
+        self.buffer += RECORD.pack(tick, agent_id, source, pos)
+        self.count += 1
+        if self.count % self.keyframe_interval == 0:
+            self.keyframe(tick)
+        if len(self.buffer) >= self.buffer_size:
+            self.full.set()
+
+    def write(self):
+        while not self.closed:
+            self.full.wait()
+            self.full.clear()
+            self.flush()
+
+    def flush(self):
+        # Seul l'échange des tampons prend le verrou de commit ; les écritures se font hors de lui, dans l'ordre
+        with self.write_lock:
+            with self.env.commit_lock:
+                buffer, self.buffer = self.buffer, bytearray()
+                keyframes, self.keyframes = self.keyframes, bytearray()
+            self.file.write(buffer)
+            self.file.flush()
+            self.keyframe_file.write(keyframes)
+            self.keyframe_file.flush()
+
+    def close(self):
+        with self.env.commit_lock:
+            self.env.unsubscribe(self.record)
+        self.closed = True
+        self.full.set()
+        self.writer.join()
+        self.flush()
+        self.file.close()
+        self.keyframe_file.close()
+
+
+class TraceReader:
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(path + ".kf", "rb") as file:
+            self.keyframe_data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n = HEADER.unpack_from(self.data)
+        if magic != TRACE_MAGIC or version != VERSION:
+            raise ValueError("%s is not a taquin trace" % path)
+        self.keyframe_size = KEYFRAME.size + 4 * self.n * self.n
+        # Une écriture interrompue peut laisser un enregistrement incomplet en fin de fichier
+        self.count = (len(self.data) - HEADER.size) // RECORD.size
+        self.keyframe_count = (len(self.keyframe_data) - HEADER.size) // self.keyframe_size
+
+    def __len__(self):
+        return self.count
+
+    def record(self, index):
+        return RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)
+
+    def records(self, start=0, stop=None):
+        stop = self.count if stop is None else min(stop, self.count)
+        for offset in range(HEADER.size + start * RECORD.size, HEADER.size + stop * RECORD.size, RECORD.size):
+            yield RECORD.unpack_from(self.data, offset)
+
+    def keyframe(self, i):
+        offset = HEADER.size + i * self.keyframe_size
+        tick, index = KEYFRAME.unpack_from(self.keyframe_data, offset)
+        board = memoryview(self.keyframe_data)[offset + KEYFRAME.size:offset + self.keyframe_size].cast("i")
+        return tick, index, list(board)
+
+    def index_at_tick(self, tick):
+        # Nombre d'enregistrements dont le tick est <= tick (les ticks sont croissants)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.record(middle)[0] <= tick:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def board_at(self, index):
+        low, high = 0, self.keyframe_count - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.keyframe(middle)[1] <= index:
+                low = middle
+            else:
+                high = middle - 1
+        _, start, board = self.keyframe(low)
+        for _, agent_id, source, pos in self.records(start, index):
+            board[source] = -1
+            board[pos] = agent_id
+        return board
+
+    def board_at_tick(self, tick):
+        return self.board_at(self.index_at_tick(tick))
+
+    def environment(self, index=0):
+        env = Environment(self.n, headless=True)
+        for pos, agent_id in enumerate(self.board_at(index)):
+            if agent_id >= 0:
+                env.add_agent(Agent(agent_id, pos, agent_id, env))
+        return env
+
+    def replay(self, env, start=0, stop=None, speed=None):
+        # speed en ticks par seconde, None pour rejouer sans attendre
+        last_tick = None
+        for tick, agent_id, source, pos in self.records(start, stop):
+            if speed and last_tick is not None and tick > last_tick:
+                time.sleep((tick - last_tick) / speed)
+            last_tick = tick
+            env.commit(env.by_id[agent_id], source, pos)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect or replay a binary move trace")
+    parser.add_argument("path")
+    parser.add_argument("--tick", type=int, help="print the board at this tick")
+    parser.add_argument("--gui", action="store_true", help="replay in the displayer")
+    parser.add_argument("--speed", type=float, default=10.0, help="ticks per second for --gui")
+    args = parser.parse_args()
+
+    reader = TraceReader(args.path)
+    start = 0 if args.tick is None else reader.index_at_tick(args.tick)
+    env = reader.environment(start)
+    print("%i moves, %i keyframes" % (len(reader), reader.keyframe_count))
+    if args.gui:
+        from threading import Thread
+        from displayer import Application
+
+        app = Application(env)
+        Thread(target=reader.replay, args=(env, start, None, args.speed), daemon=True).start()
+        app.mainloop()
+    else:
+        print(env)
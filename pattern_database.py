@@ -0,0 +1,136 @@
+import argparse
+import mmap
+import os
+import time
+from array import array
+from bisect import insort
+from utils import PositionManager as PosMan
+
+
+class PatternDatabase:
+    DIRECTORY = "pdb"
+    # Partitions additives disjointes des tuiles (identifiants = cases cibles). Les partitions 7-8 (4x4) et
+    # 6-6-6-6 (5x5) donneraient de meilleures bornes, mais leur BFS en Python parcourt des milliards de couples
+    # (motif, case vide) : plusieurs heures et plus de 1 Gio de bitmap pour le motif de 8 tuiles. En 4x4,
+    # 6-6-3 (deux blocs 2x3 et la colonne de droite) se construit en une douzaine de minutes et réduit d'un tiers le
+    # temps de résolution de 5-5-5
+    PARTITIONS = {
+        3: ((0, 1, 3, 4), (2, 5, 6, 7)),
+        4: ((0, 1, 2, 4, 5, 6), (8, 9, 10, 12, 13, 14), (3, 7, 11)),
+        5: ((0, 1, 5, 6), (2, 3, 7, 8), (4, 9, 14, 19), (10, 11, 15, 16), (12, 13, 17, 18), (20, 21, 22, 23)),
+    }
+
+    def __init__(self, n, tiles, table):
+        self.n = n
+        self.tiles = tuple(tiles)
+        self.table = table
+        cells = n * n
+        self.multipliers = []
+        multiplier = 1
+        for i in reversed(range(len(tiles))):
+            self.multipliers.insert(0, multiplier)
+            multiplier *= cells - i
+        self.size = multiplier
+
+    @staticmethod
+    def path(n, tiles, directory=DIRECTORY):
+        return os.path.join(directory, "%ix%i-%s.bin" % (n, n, "-".join(str(tile) for tile in tiles)))
+
+    @staticmethod
+    def open(n, tiles, directory=DIRECTORY):
+        with open(PatternDatabase.path(n, tiles, directory), "rb") as file:
+            table = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return PatternDatabase(n, tiles, table)
+
+    def rank(self, positions):
+        index = 0
+        for i, pos in enumerate(positions):
+            rank = pos
+            for j in range(i):
+                if positions[j] < pos:
+                    rank -= 1
+            index += rank * self.multipliers[i]
+        return index
+
+    def unrank(self, index):
+        positions = []
+        taken = []
+        for i, multiplier in enumerate(self.multipliers):
+            pos = index // multiplier % (self.n * self.n - i)
+            for other in taken:
+                if other <= pos:
+                    pos += 1
+            positions.append(pos)
+            insort(taken, pos)
+        return positions
+
+    def lookup(self, positions):
+        return self.table[self.rank(positions)]
+
+    @staticmethod
+    def build(n, tiles, directory=DIRECTORY):
+        cells = n * n
+        neighbors = PosMan.get_neighbors_table(n)
+        database = PatternDatabase(n, tiles, None)
+        table = bytearray(b"\xff") * database.size
+        seen = bytearray((database.size * cells + 7) // 8)  # couples (motif, case vide) déjà visités
+
+        # BFS rétrograde depuis le but : seuls les déplacements des tuiles du motif coûtent 1,
+        # la case vide se déplace librement dans sa région. Une couche est un array de codes
+        # index * cells + case vide, chacun mis en file une seule fois : 8 octets par état plutôt qu'un
+        # tuple par chemin
+        layer = array('q', [database.rank(tiles) * cells + cells - 1])
+        depth = 0
+        while layer:
+            next_layer = array('q')
+            queued = bytearray(len(seen))
+            for code in layer:
+                if seen[code >> 3] & (1 << (code & 7)):
+                    continue
+                index, blank = divmod(code, cells)
+                if table[index] == 0xFF:
+                    table[index] = depth
+                positions = database.unrank(index)
+                occupied = {pos: slot for slot, pos in enumerate(positions)}
+                base = index * cells
+                seen[code >> 3] |= 1 << (code & 7)
+                region = [blank]
+                for cell in region:
+                    for neighbor in neighbors[cell]:
+                        if neighbor in occupied:
+                            moved = list(positions)
+                            moved[occupied[neighbor]] = cell
+                            code = database.rank(moved) * cells + neighbor
+                            bit = 1 << (code & 7)
+                            if not (seen[code >> 3] | queued[code >> 3]) & bit:
+                                queued[code >> 3] |= bit
+                                next_layer.append(code)
+                        elif not seen[(base + neighbor) >> 3] & (1 << ((base + neighbor) & 7)):
+                            seen[(base + neighbor) >> 3] |= 1 << ((base + neighbor) & 7)
+                            region.append(neighbor)
+            layer = next_layer
+            depth += 1
+
+        os.makedirs(directory, exist_ok=True)
+        path = PatternDatabase.path(n, tiles, directory)
+        with open(path + ".tmp", "wb") as file:
+            file.write(table)
+        os.replace(path + ".tmp", path)
+        return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build additive pattern databases")
+    parser.add_argument("n", type=int)
+    parser.add_argument("--tiles", action="append", help="comma separated tiles of one pattern (repeatable)")
+    parser.add_argument("--directory", default=PatternDatabase.DIRECTORY)
+    args = parser.parse_args()
+
+    if args.tiles:
+        partition = [tuple(int(tile) for tile in tiles.split(",")) for tiles in args.tiles]
+    else:
+        partition = PatternDatabase.PARTITIONS[args.n]
+    for tiles in partition:
+        start = time.time()
+        path = PatternDatabase.build(args.n, tiles, args.directory)
+        print("%s built in %.1fs" % (path, time.time() - start))
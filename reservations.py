@@ -0,0 +1,58 @@
+from array import array
+from threading import Lock
+
+
+class ReservationTable:
+    # Anneau de tranches de temps : la tranche du tick t est slices[t % depth] ; les tranches passées
+    # sont effacées et réutilisées, la mémoire reste depth * cells entiers quelle que soit la durée
+    def __init__(self, cells, depth):
+        self.cells = cells
+        self.depth = depth
+        self.empty = array('i', [-1]) * cells
+        self.slices = [array('i', self.empty) for _ in range(depth)]
+        self.base = 0  # Plus ancien tick conservé
+        self.held = {}
+        self.horizons = {}
+        self.lock = Lock()
+
+    def expire(self, tick):
+        if tick <= self.base:
+            return
+        for old in range(self.base, min(tick, self.base + self.depth)):
+            self.slices[old % self.depth][:] = self.empty
+        self.base = tick
+
+    def owner(self, pos, tick):
+        if self.base <= tick < self.base + self.depth:
+            return self.slices[tick % self.depth][pos]
+        return -1
+
+    def horizon(self, id_):
+        return self.horizons.get(id_, -1)
+
+    def release(self, id_):
+        for tick, pos in self.held.pop(id_, ()):
+            if tick >= self.base:
+                slice_ = self.slices[tick % self.depth]
+                if slice_[pos] == id_:
+                    slice_[pos] = -1
+        self.horizons.pop(id_, None)
+
+    def reserve(self, id_, start, cells):
+        self.release(id_)
+        held = []
+        for tick, pos in enumerate(cells, start):
+            if tick >= self.base + self.depth:
+                break
+            if tick < self.base:
+                continue
+            slice_ = self.slices[tick % self.depth]
+            if slice_[pos] < 0:
+                slice_[pos] = id_
+                held.append((tick, pos))
+        if held:
+            self.held[id_] = held
+            self.horizons[id_] = held[-1][0]
+
+    def __len__(self):
+        return sum(len(held) for held in self.held.values())
@@ -0,0 +1,33 @@
+import random
+import time
+
+
+class Scheduler:
+    def __init__(self, env, seed=None, shuffle=True):
+        self.env = env
+        self.random = random.Random(seed)
+        self.shuffle = shuffle
+        self.ticks = 0
+
+    def order(self):
+        agents = sorted(self.env.agents.values(), key=lambda agent: agent.id)
+        if self.shuffle:
+            self.random.shuffle(agents)
+        return agents
+
+    def tick(self):
+        for agent in self.order():
+            if not agent.done():
+                agent.step()
+        self.ticks += 1
+        self.env.tick += 1
+
+    def run(self, max_steps=None, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.env.is_finish():
+            if max_steps is not None and self.ticks >= max_steps:
+                break
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            self.tick()
+        return self.ticks
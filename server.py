@@ -0,0 +1,343 @@
+import argparse
+import json
+import os
+import queue
+import signal
+import sys
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pool, SimpleQueue
+from socketserver import ThreadingMixIn, UnixStreamServer
+from threading import Lock, Semaphore, Thread
+from batch import STRATEGIES, check_board, init_worker, solve_board
+from instrumentation import Profiler
+from solution_cache import SolutionCache
+
+
+def unsolved(task, status):
+    id_, board, strategy = task[:3]
+    return {"id": id_, "n": int(round(len(board) ** 0.5)), "board": board, "strategy": strategy,
+            "status": status, "moves": None, "length": None, "expanded": None}
+
+
+outbox = None
+
+
+def init_server_worker(sizes, results, table):
+    # File partagée avec le serveur : chaque plateau d'un lot y est remis dès qu'il est résolu
+    global outbox
+    outbox = results
+    init_worker(sizes, table)
+
+
+def solve_batch(key, tasks, deadlines):
+    # Les échéances sont des dates time.time() : chaque plateau du lot n'a que le temps qui reste
+    for i, (task, deadline) in enumerate(zip(tasks, deadlines)):
+        if deadline is not None:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                outbox.put((key, i, unsolved(task, "expired")))
+                continue
+            task = task[:3] + (timeout,) + task[4:]
+        outbox.put((key, i, solve_board(task)))
+
+
+class SolveRequest:
+    def __init__(self, count, deadline):
+        self.count = count
+        self.deadline = deadline  # time.time() au-delà duquel les plateaux encore à résoudre sont abandonnés
+        self.start = time.monotonic()
+        self.results = queue.Queue()
+        self.cancelled = False
+
+    def expired(self, now):
+        return self.cancelled or (self.deadline is not None and now >= self.deadline)
+
+    def stream(self):
+        # Chaque plateau produit exactement un résultat : résolu, abandonné ou en erreur
+        for _ in range(self.count):
+            yield self.results.get()
+
+
+class SolveService:
+    # Pool de processus chauds partagé par toutes les requêtes. Un thread répartiteur regroupe les plateaux
+    # arrivés dans une fenêtre de BATCH_WINDOW secondes en lots de BATCH_SIZE au plus, et n'en garde que 2 par
+    # processus en vol : le reste attend dans la file, où les échéances sont vérifiées avant l'envoi. Les
+    # processus renvoient chaque plateau dès qu'il est résolu, sans attendre la fin de son lot ; un thread
+    # collecteur le remet à sa requête.
+    BATCH_SIZE = 8
+    BATCH_WINDOW = 0.005
+    MAX_PENDING = 256
+    DEADLINE = 60  # Secondes accordées à une requête sans échéance
+    MAX_DEADLINE = 600  # Plafond des échéances demandées : un plateau difficile ne garde pas un processus sans fin
+
+    def __init__(self, processes=None, sizes=(), cache=SolutionCache.PATH, batch_size=BATCH_SIZE,
+                 batch_window=BATCH_WINDOW, max_pending=MAX_PENDING, deadline=DEADLINE, max_deadline=MAX_DEADLINE,
+                 table_bytes=0):
+        self.processes = processes or os.cpu_count()
+        self.cache = cache
+        self.max_deadline = max_deadline
+        self.deadline = min(deadline, max_deadline)
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_pending = max_pending
+        self.outbox = SimpleQueue()
+        self.pool = Pool(self.processes, initializer=init_server_worker,
+                         initargs=(sizes, self.outbox, table_bytes))
+        self.slots = Semaphore(2 * self.processes)
+        self.queue = queue.Queue()
+        self.batches = {}  # clé -> {rang dans le lot: (requête, tâche)} des plateaux pas encore remis
+        self.next_key = 0
+        self.pending = 0
+        self.lock = Lock()
+        self.profiler = Profiler()
+        self.started = time.monotonic()
+        self.dispatcher = Thread(target=self.dispatch, daemon=True, name="Dispatcher")
+        self.dispatcher.start()
+        self.collector = Thread(target=self.collect, daemon=True, name="Collector")
+        self.collector.start()
+
+    def submit(self, boards, strategy="ida", timeout=None, max_steps=10000, seed=None):
+        # Au-delà de max_pending plateaux en cours, la requête est refusée plutôt que mise en file sans borne
+        with self.lock:
+            if self.pending + len(boards) > self.max_pending:
+                self.profiler.count("server.rejected")
+                return None
+            self.pending += len(boards)
+        self.profiler.count("server.requests")
+        self.profiler.count("server.boards", len(boards))
+        timeout = self.deadline if timeout is None else min(timeout, self.max_deadline)
+        request = SolveRequest(len(boards), time.time() + timeout)
+        for i, board in enumerate(boards):
+            self.queue.put((request, (i, board, strategy, None, max_steps, seed, self.cache)))
+        return request
+
+    def dispatch(self):
+        while True:
+            self.slots.acquire()
+            # Tant que les processus sont occupés, les plateaux s'accumulent et le lot suivant grossit
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            if self.queue.empty():
+                time.sleep(self.batch_window)
+            # La file est partagée entre les processus : un lot n'emporte pas à lui seul des plateaux que
+            # d'autres processus résoudraient en parallèle
+            size = min(self.batch_size, -(-(1 + self.queue.qsize()) // self.processes))
+            while len(batch) < size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None)
+                    break
+                batch.append(item)
+
+            now = time.time()
+            requests = []
+            tasks = []
+            for request, task in batch:
+                if request.expired(now):
+                    self.finish(request, unsolved(task, "expired"))
+                    continue
+                requests.append(request)
+                tasks.append(task)
+            if not tasks:
+                self.slots.release()
+                continue
+            self.profiler.count("server.batches")
+            self.profiler.observe("server.batch_size", len(tasks))
+            deadlines = [request.deadline for request in requests]
+            key = self.next_key
+            self.next_key += 1
+            self.batches[key] = dict(enumerate(zip(requests, tasks)))
+            self.pool.apply_async(solve_batch, (key, tasks, deadlines), callback=self.done,
+                                  error_callback=partial(self.fail, key))
+
+    def done(self, _):
+        self.slots.release()
+
+    def fail(self, key, error):
+        # Passe par la file des résultats, derrière ceux que le processus a remis avant l'erreur
+        self.slots.release()
+        self.outbox.put((key, None, repr(error)))
+
+    def collect(self):
+        while True:
+            item = self.outbox.get()
+            if item is None:
+                return
+            key, i, result = item
+            batch = self.batches[key]
+            if i is None:
+                # Lot interrompu : les plateaux qui n'ont pas été remis finissent en erreur
+                for request, task in batch.values():
+                    self.finish(request, dict(unsolved(task, "error"), error=result))
+                batch.clear()
+            else:
+                self.finish(batch.pop(i)[0], result)
+            if not batch:
+                del self.batches[key]
+
+    def finish(self, request, result):
+        with self.lock:
+            self.pending -= 1
+        self.profiler.count("server.status." + result["status"])
+        if result.get("cached"):
+            self.profiler.count("server.cached")
+        for field, value in result.get("table", {}).items():
+            self.profiler.count("server.table." + field, value)
+        self.profiler.time("server.latency", time.monotonic() - request.start)
+        request.results.put(result)
+
+    def health(self):
+        return {"status": "ok" if self.dispatcher.is_alive() else "stopped", "processes": self.processes,
+                "pending": self.pending, "max_pending": self.max_pending}
+
+    def metrics(self):
+        profile = self.profiler.profile()
+        del profile["agents"]
+        profile.update(self.health(), queued=self.queue.qsize(), uptime=time.monotonic() - self.started)
+        return profile
+
+    def close(self):
+        self.queue.put(None)
+        self.slots.release()
+        self.dispatcher.join()
+        self.pool.terminate()
+        self.pool.join()
+        self.outbox.put(None)
+        self.collector.join()
+
+
+def read_request(data):
+    # Toute la requête est vérifiée ici : une erreur répond 400 au lieu d'échouer plus tard dans un processus.
+    # Mêmes plateaux que batch.py : clairsemés pour les stratégies d'agents, complets pour ida et beam
+    if not isinstance(data, dict):
+        raise ValueError("request must be a JSON object")
+    strategy = data.get("strategy", "ida")
+    if strategy not in STRATEGIES:
+        raise ValueError("unknown strategy %r" % (strategy,))
+    boards = data["boards"] if "boards" in data else [data["board"]]
+    if not isinstance(boards, list) or not boards:
+        raise ValueError("boards must be a non-empty list of boards")
+    timeout = data.get("deadline")
+    if timeout is not None and (type(timeout) not in (int, float) or not timeout > 0):
+        raise ValueError("deadline must be a positive number of seconds: %r" % (timeout,))
+    max_steps = data.get("max_steps", 10000)
+    if type(max_steps) is not int or max_steps <= 0:
+        raise ValueError("max_steps must be a positive integer: %r" % (max_steps,))
+    seed = data.get("seed")
+    if seed is not None and type(seed) is not int:
+        raise ValueError("seed must be an integer or null: %r" % (seed,))
+    checked = []
+    for board in boards:
+        board = tuple(board) if isinstance(board, list) else board
+        check_board(board, strategy)
+        checked.append(board)
+    return checked, strategy, timeout, max_steps, seed
+
+
+class SolveHandler(BaseHTTPRequestHandler):
+    def address_string(self):
+        # Socket Unix : pas d'adresse de client
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def send_json(self, code, data, headers=()):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/health":
+            self.send_json(200, service.health())
+        elif self.path == "/metrics":
+            self.send_json(200, service.metrics())
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/solve":
+            self.send_json(404, {"error": "not found"})
+            return
+        try:
+            data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            boards, strategy, timeout, max_steps, seed = read_request(data)
+        except (ValueError, KeyError, TypeError) as error:
+            self.send_json(400, {"error": str(error)})
+            return
+        request = self.server.service.submit(boards, strategy, timeout, max_steps, seed)
+        if request is None:
+            self.send_json(503, {"error": "too many pending boards"}, [("Retry-After", "1")])
+            return
+
+        # Une ligne JSON par plateau, envoyée dès qu'il est résolu, même au milieu d'un lot : le flux est par
+        # plateau, les déplacements d'un plateau arrivent ensemble dans sa ligne. La connexion se ferme après le
+        # dernier
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for result in request.stream():
+                self.wfile.write((json.dumps(result) + "\n").encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            request.cancelled = True  # Les plateaux encore en file ne seront pas résolus
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Long-running local solve server streaming JSON lines")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--sizes", default="3,4", help="board sizes whose heuristic tables are loaded at start")
+    parser.add_argument("--batch-size", type=int, default=SolveService.BATCH_SIZE)
+    parser.add_argument("--batch-window", type=float, default=SolveService.BATCH_WINDOW, help="seconds")
+    parser.add_argument("--max-pending", type=int, default=SolveService.MAX_PENDING,
+                        help="boards accepted at once before answering 503")
+    parser.add_argument("--deadline", type=float, default=SolveService.DEADLINE,
+                        help="seconds per request when the client sends no deadline")
+    parser.add_argument("--max-deadline", type=float, default=SolveService.MAX_DEADLINE,
+                        help="cap on the deadline a client may ask for, in seconds")
+    parser.add_argument("--table-bytes", type=int, default=0,
+                        help="transposition table per IDA* solver, in bytes (4x4 and smaller; 0 disables it)")
+    parser.add_argument("--cache", default=SolutionCache.PATH, help="persistent solution cache (sqlite)")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    service = SolveService(args.processes, sizes, None if args.no_cache else args.cache, args.batch_size,
+                           args.batch_window, args.max_pending, args.deadline, args.max_deadline,
+                           args.table_bytes)
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.remove(args.unix)
+        server = UnixHTTPServer(args.unix, SolveHandler)
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), SolveHandler)
+    server.service = service
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # Arrêt propre : pool fermé, socket Unix supprimé
+    print("listening on %s" % (args.unix or "http://%s:%i" % (args.host, args.port)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.unix:
+            os.remove(args.unix)
@@ -0,0 +1,130 @@
+import argparse
+import json
+import sqlite3
+import time
+
+
+class SolutionCache:
+    PATH = "solutions.sqlite"
+    MAX_BYTES = 256 << 20
+    TIMEOUT = 30.0  # Attente maximale du verrou d'écriture entre processus
+    TOUCH_BATCH = 64  # Horodatages LRU des lectures regroupés en une seule écriture
+    SCHEMA = 1  # Incrémenté quand l'encodage des clés change : les anciennes entrées sont abandonnées
+
+    def __init__(self, path=PATH, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evictions = 0
+        self.written = 0  # Octets écrits depuis la dernière vérification de la taille
+        self.touched = {}  # (clé, stratégie) -> date de la dernière lecture, pas encore écrite
+        # WAL : les lecteurs de plusieurs processus ne bloquent pas l'écrivain ni entre eux
+        self.connection = sqlite3.connect(path, timeout=self.TIMEOUT, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        # Schéma vérifié et créé dans une seule transaction d'écriture : deux processus qui démarrent
+        # ensemble ne suppriment pas la table que l'autre vient de créer
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA:
+                self.connection.execute("DROP TABLE IF EXISTS solutions")
+                self.connection.execute("PRAGMA user_version = %i" % self.SCHEMA)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS solutions ("
+                                    "key BLOB NOT NULL, strategy TEXT NOT NULL, n INTEGER NOT NULL, "
+                                    "result TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL, "
+                                    "PRIMARY KEY (key, strategy)) WITHOUT ROWID")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)")
+
+    @staticmethod
+    def key(board):
+        # Contrairement à solver.pack, la case vide vaut n*n : un plateau clairsemé peut porter la tuile n*n-1
+        n = int(round(len(board) ** 0.5))
+        size = n * n
+        bits = size.bit_length()
+        key = 0
+        for pos, tile in enumerate(board):
+            key |= (tile if tile >= 0 else size) << (bits * pos)
+        return key.to_bytes((bits * size + 7) // 8, "little")
+
+    def get(self, board, strategy):
+        key = self.key(board)
+        row = self.connection.execute("SELECT result FROM solutions WHERE key = ? AND strategy = ?",
+                                      (key, strategy)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touched[(key, strategy)] = time.time()
+        if len(self.touched) >= self.TOUCH_BATCH:
+            self.touch()
+        return json.loads(row[0])
+
+    def touch(self):
+        # Sans attendre le verrou d'écriture : une lecture ne doit pas faire la queue derrière un écrivain
+        # ou une éviction. Base occupée, les horodatages repartent avec le lot suivant.
+        if not self.touched:
+            return
+        self.connection.execute("PRAGMA busy_timeout = 0")
+        try:
+            with self.connection:
+                self.connection.execute("BEGIN IMMEDIATE")
+                self.connection.executemany("UPDATE solutions SET used = ? WHERE key = ? AND strategy = ?",
+                                            [(used, key, strategy)
+                                             for (key, strategy), used in self.touched.items()])
+            self.touched.clear()
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            self.connection.execute("PRAGMA busy_timeout = %i" % (self.TIMEOUT * 1000))
+
+    def put(self, board, strategy, result):
+        data = json.dumps(result)
+        size = len(data) + len(board)
+        self.connection.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)",
+                                (self.key(board), strategy, int(round(len(board) ** 0.5)), data, size,
+                                 time.time()))
+        self.written += size
+        if self.written * 64 >= self.max_bytes:
+            self.evict()
+
+    def size(self):
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM solutions").fetchone()[0]
+
+    def evict(self):
+        self.written = 0
+        self.touch()
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        # Les entrées les moins récemment utilisées partent en premier, jusqu'à repasser sous la limite
+        victims = []
+        for key, strategy, size in self.connection.execute(
+                "SELECT key, strategy, size FROM solutions ORDER BY used"):
+            victims.append((key, strategy))
+            excess -= size
+            if excess <= 0:
+                break
+        self.connection.executemany("DELETE FROM solutions WHERE key = ? AND strategy = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self):
+        count, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM solutions").fetchone()
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+    def close(self):
+        self.touch()
+        self.connection.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect or trim the persistent solution cache")
+    parser.add_argument("--path", default=SolutionCache.PATH)
+    parser.add_argument("--max-bytes", type=int, default=SolutionCache.MAX_BYTES)
+    parser.add_argument("--evict", action="store_true", help="trim the cache down to --max-bytes")
+    args = parser.parse_args()
+
+    cache = SolutionCache(args.path, args.max_bytes)
+    if args.evict:
+        cache.evict()
+    print(json.dumps(cache.stats()))
+    cache.close()
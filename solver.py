@@ -0,0 +1,174 @@
+import time
+from heuristics import default_heuristic
+from transposition import TranspositionTable
+from utils import PositionManager as PosMan
+
+
+class UnsolvableException(Exception):
+    pass
+
+
+class SearchTimeoutException(Exception):
+    pass
+
+
+class BeamExhaustedException(Exception):
+    pass
+
+
+def board_from_env(env):
+    return tuple(env.by_id[id_].target if id_ >= 0 else -1 for id_ in env.grid)
+
+
+def is_solvable(board, n):
+    tiles = [tile for tile in board if tile >= 0]
+    inversions = 0
+    for i, tile in enumerate(tiles):
+        for other in tiles[i + 1:]:
+            if other < tile:
+                inversions += 1
+    if n % 2:
+        return inversions % 2 == 0
+    return (inversions + board.index(-1) // n) % 2 == (n - 1) % 2
+
+
+def random_board(n, rng):
+    board = list(range(n * n - 1)) + [-1]
+    rng.shuffle(board)
+    if not is_solvable(board, n):
+        first, second = [pos for pos, tile in enumerate(board) if tile >= 0][:2]
+        board[first], board[second] = board[second], board[first]
+    return tuple(board)
+
+
+def random_sparse_board(n, agents, rng):
+    # Plateau d'entrepôt : chaque agent porte le numéro de sa case cible, les autres cases sont vides
+    board = [-1] * (n * n)
+    for pos, target in zip(rng.sample(range(n * n), agents), rng.sample(range(n * n), agents)):
+        board[pos] = target
+    return tuple(board)
+
+
+def pack(board, n):
+    bits = (n * n - 1).bit_length()
+    blank = n * n - 1
+    key = 0
+    for pos, tile in enumerate(board):
+        key |= (tile if tile >= 0 else blank) << (bits * pos)
+    return key
+
+
+def unpack(key, n):
+    bits = (n * n - 1).bit_length()
+    mask = (1 << bits) - 1
+    blank = n * n - 1
+    board = []
+    for _ in range(n * n):
+        tile = key & mask
+        board.append(tile if tile != blank else -1)
+        key >>= bits
+    return tuple(board)
+
+
+def replay(env, moves):
+    agents = {agent.target: agent for agent in env.by_id.values()}
+    for tile, pos in moves:
+        if not env.next_move(agents[tile], pos):
+            return False
+    return True
+
+
+class Solver:
+    # IDA* optimal. L'objectif d'un 4x4 en bien moins d'une seconde n'est pas atteint : avec les tables 6-6-3
+    # (python pattern_database.py 4), un 4x4 tiré au hasard prend 8 à 11 s en moyenne, un plateau à 50 coups
+    # du but environ 0,13 s. Sans les tables, la distance de Manhattan avec conflits linéaires prend plus d'une
+    # minute sur les plateaux difficiles
+    FOUND = -1
+
+    def __init__(self, n, heuristic=None, table_bytes=0):
+        self.n = n
+        self.heuristic = heuristic if heuristic is not None else default_heuristic(n)
+        self.neighbors = PosMan.get_neighbors_table(n)
+        # Table indexée par le plateau packé sur 64 bits : réservée aux plateaux jusqu'à 4x4, et sur demande
+        # (table_bytes, --table-bytes de batch.py et server.py). Sonde et enregistrement coûtent plus que les
+        # nœuds qu'ils évitent sur les plateaux proches du but ; elle ne paie qu'au-delà d'une quarantaine de coups
+        self.transpositions = None
+        if table_bytes and TranspositionTable.fits(n):
+            self.transpositions = TranspositionTable(table_bytes)
+        self.expanded = 0
+
+    def solve(self, board, timeout=None):
+        n = self.n
+        board = list(board)
+        if len(board) != n * n or sorted(board) != [-1] + list(range(n * n - 1)):
+            raise ValueError("board must hold tiles 0..%i and one blank (-1)" % (n * n - 2))
+        if not is_solvable(board, n):
+            raise UnsolvableException
+
+        move = self.heuristic.move
+        undo = self.heuristic.undo
+        neighbors = self.neighbors
+        table = self.transpositions
+        blank_code = n * n - 1
+        shifts = [(n * n - 1).bit_length() * pos for pos in range(n * n)]
+        path = []
+        found = self.FOUND
+        expanded = 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def search(blank, g, h, previous, key):
+            nonlocal expanded
+            expanded += 1
+            if deadline is not None and not expanded & 0xFFF and time.monotonic() > deadline:
+                raise SearchTimeoutException
+            minimum = None
+            g += 1
+            for pos in neighbors[blank]:
+                if pos == previous:
+                    continue
+                tile = board[pos]
+                board[blank] = tile
+                board[pos] = -1
+                child_h = move(board, tile, pos, blank, h)
+                if g + child_h > bound:
+                    t = g + child_h
+                else:
+                    path.append((tile, blank))
+                    if child_h == 0:
+                        return found
+                    child_key = 0
+                    t = None
+                    if table is not None:
+                        delta = tile ^ blank_code
+                        child_key = key ^ (delta << shifts[blank]) ^ (delta << shifts[pos])
+                        seen = table.probe(child_key)
+                        # Déjà exploré dans cette itération avec un coût moindre : sous-arbre dominé
+                        if not 0 <= seen <= g:
+                            table.store(child_key, g, bound - g)
+                            t = search(pos, g, child_h, blank, child_key)
+                    else:
+                        t = search(pos, g, child_h, blank, child_key)
+                    if t == found:
+                        return found
+                    path.pop()
+                undo()
+                board[pos] = tile
+                board[blank] = -1
+                if t is not None and (minimum is None or t < minimum):
+                    minimum = t
+            return minimum
+
+        h = self.heuristic.evaluate(board)
+        key = pack(board, n) if table is not None else 0
+        bound = h
+        try:
+            while h:
+                if table is not None:
+                    table.new_search()
+                    table.store(key, 0, bound)
+                bound = search(board.index(-1), 0, h, None, key)
+                if bound == found:
+                    break
+        finally:
+            self.expanded = expanded
+        return path
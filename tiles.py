@@ -0,0 +1,55 @@
+import hashlib
+import os
+import shutil
+
+CACHE_DIRECTORY = ".tile_cache"
+DEFAULT_TILES = "images/4x4"
+DEFAULT_N = 4
+
+
+def default_tile_paths():
+    # Les 16 cases, y compris la 15.png du coin : sans elle, l'image recomposée a un coin noir
+    return [os.path.join(DEFAULT_TILES, "%i.png" % i) for i in range(DEFAULT_N * DEFAULT_N)]
+
+
+def source_digest(source):
+    digest = hashlib.sha1()
+    for path in ([source] if source is not None else default_tile_paths()):
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def open_source(source):
+    from PIL import Image
+
+    if source is not None:
+        return Image.open(source).convert("RGB")
+    # Pas d'image source : on recompose l'image à partir des tuiles 4x4 prédécoupées
+    tiles = [Image.open(path) for path in default_tile_paths()]
+    width, height = tiles[0].size
+    image = Image.new("RGB", (DEFAULT_N * width, DEFAULT_N * height))
+    for i, tile in enumerate(tiles):
+        image.paste(tile, ((i % DEFAULT_N) * width, (i // DEFAULT_N) * height))
+    return image
+
+
+def build_tiles(source, n, width, height, path):
+    tile_width, tile_height = width // n, height // n
+    image = open_source(source).resize((tile_width * n, tile_height * n))
+    os.makedirs(path)
+    for i in range(n * n - 1):
+        x, y = (i % n) * tile_width, (i // n) * tile_height
+        image.crop((x, y, x + tile_width, y + tile_height)).save(os.path.join(path, "%i.ppm" % i))
+
+
+def slice_tiles(source, n, width, height, directory=CACHE_DIRECTORY):
+    path = os.path.join(directory, "%s-%i-%ix%i" % (source_digest(source)[:16], n, width, height))
+    if not os.path.isdir(path):
+        building = "%s.%i.tmp" % (path, os.getpid())
+        build_tiles(source, n, width, height, building)
+        try:
+            os.rename(building, path)
+        except OSError:
+            shutil.rmtree(building, ignore_errors=True)  # Un autre processus a rempli le cache en même temps
+    return [os.path.join(path, "%i.ppm" % i) for i in range(n * n - 1)]
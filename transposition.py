@@ -0,0 +1,69 @@
+from array import array
+
+
+class TranspositionTable:
+    # Seaux de deux entrées : la première garde l'état le plus profond restant à explorer (depth-preferred),
+    # la seconde est toujours remplacée. Une entrée n'est valable que pour l'itération qui l'a écrite.
+    ENTRY_BYTES = 14
+    MULTIPLIER = 0x9E3779B97F4A7C15
+    MAX_BYTES = 16 << 20
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        buckets = 1
+        while buckets * 4 * self.ENTRY_BYTES <= max_bytes:
+            buckets *= 2
+        self.shift = 64 - (buckets.bit_length() - 1)
+        self.capacity = buckets * 2
+        self.keys = array('Q', [0]) * self.capacity
+        self.generations = array('I', [0]) * self.capacity
+        self.costs = array('B', [0]) * self.capacity
+        self.depths = array('B', [0]) * self.capacity
+        self.generation = 0
+        self.probes = self.hits = self.stores = self.replacements = 0
+
+    @staticmethod
+    def fits(n):
+        return n * n * (n * n - 1).bit_length() <= 64
+
+    def new_search(self):
+        self.generation += 1
+        if self.generation == 0xFFFFFFFF:
+            self.generations = array('I', [0]) * self.capacity
+            self.generation = 1
+
+    def slot(self, key):
+        return ((key * self.MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self.shift << 1
+
+    def probe(self, key):
+        # Coût g avec lequel l'état a déjà été exploré dans l'itération courante, -1 sinon
+        self.probes += 1
+        slot = self.slot(key)
+        for index in (slot, slot + 1):
+            if self.keys[index] == key and self.generations[index] == self.generation:
+                self.hits += 1
+                return self.costs[index]
+        return -1
+
+    def store(self, key, cost, depth):
+        self.stores += 1
+        slot = self.slot(key)
+        keys, generations, depths = self.keys, self.generations, self.depths
+        if keys[slot] != key and generations[slot] == self.generation and depths[slot] > depth:
+            slot += 1
+        elif keys[slot] != key and generations[slot] == self.generation:
+            # L'entrée profonde évincée descend dans la case toujours remplacée
+            keys[slot + 1] = keys[slot]
+            generations[slot + 1] = generations[slot]
+            self.costs[slot + 1] = self.costs[slot]
+            depths[slot + 1] = depths[slot]
+        if generations[slot] == self.generation and keys[slot] != key:
+            self.replacements += 1
+        keys[slot] = key
+        generations[slot] = self.generation
+        self.costs[slot] = cost
+        depths[slot] = depth
+
+    def stats(self):
+        return {"capacity": self.capacity, "bytes": self.capacity * self.ENTRY_BYTES, "probes": self.probes,
+                "hits": self.hits, "misses": self.probes - self.hits, "stores": self.stores,
+                "replacements": self.replacements}
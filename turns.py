@@ -0,0 +1,106 @@
+from utils import PositionManager as PosMan
+
+
+class SequentialTurns:
+    PARALLEL = False  # Un seul tour actif : toute tuile de moindre priorité peut être poussée, même arrivée
+
+    def __init__(self, env):
+        self.env = env
+
+    def start(self):
+        return [min(self.env.by_id, default=0)]
+
+    def rank(self, id_):
+        return id_
+
+    def end_turn(self, agent):
+        id_ = agent.id + agent.next
+        # Plateaux clairsemés : les identifiants (cases cibles) ne se suivent pas
+        while id_ not in self.env.by_id and id_ < self.env.grid_size:
+            id_ += 1
+        if id_ >= self.env.grid_size and self.env.blanks > 1:
+            # Fin de passe : les tuiles délogées depuis leur arrivée reprennent leur tour
+            late = [other.id for other in self.env.by_id.values() if not other.end]
+            if late:
+                return [min(late)]
+        return [id_]
+
+
+class RegionTurns:
+    # Couche k : la ligne k (colonnes k..n-1) et la colonne k (lignes k+1..n-1) du sous-plateau restant
+    # sont résolues en parallèle. Les manœuvres de fin de ligne et de colonne (N2/N1) se bloquent
+    # mutuellement dans un petit sous-plateau : ses TAIL dernières lignes et colonnes gardent l'ordre de
+    # SequentialTurns, en un seul couloir (tout le plateau jusqu'à n = TAIL). Les deux couloirs ne gagnent
+    # du temps que si un déplacement en prend (move_delay) : sous le Scheduler, un tick fait avancer tous
+    # les agents quel que soit l'ordre.
+    TAIL = 6
+    PARALLEL = True
+
+    def __init__(self, env, tail=TAIL):
+        self.env = env
+        self.layers = RegionTurns.layers(env.n, env.blanks > 1, tail)
+        # Priorité des GiveWay : l'ordre des couches remplace l'ordre des identifiants
+        self.ranks = {id_: i for i, id_ in enumerate(id_ for layer in self.layers for lane in layer for id_ in lane)}
+        self.layer = 0
+        self.lanes = []
+        self.late = False  # Passe de rattrapage : seules les tuiles pas encore arrivées reprennent leur tour
+
+    @staticmethod
+    def layers(n, sparse=False, tail=TAIL):
+        layers = []
+        start = max(n - tail, 0)
+        for k in range(start):
+            row = [PosMan.pos_1D(x, k, n) for x in range(k, n)]
+            column = [PosMan.pos_1D(k, y, n) for y in range(k + 1, n)]
+            layers.append([row, column])
+        if sparse:
+            # DetourActuator partout : l'ordre séquentiel est celui des identifiants, case du coin comprise
+            lane = [PosMan.pos_1D(x, y, n) for y in range(start, n) for x in range(start, n)]
+        else:
+            # Lignes entières jusqu'à n-3, puis les deux dernières lignes colonne par colonne et le bloc 2x2
+            last = n - 2
+            lane = [PosMan.pos_1D(x, y, n) for y in range(start, last) for x in range(start, n)]
+            lane += [PosMan.pos_1D(x, y, n) for x in range(start, last) for y in (last, last + 1)]
+            lane += [PosMan.pos_1D(last, last, n), PosMan.pos_1D(last, last + 1, n), PosMan.pos_1D(last + 1, last, n)]
+        layers.append([lane])
+        return layers
+
+    def rank(self, id_):
+        return self.ranks.get(id_, id_)
+
+    def next_in_lane(self, lane):
+        # Les cases sans agent (plateaux incomplets) sont sautées
+        by_id = self.env.by_id
+        lane[:] = [id_ for id_ in lane if id_ in by_id and not (self.late and by_id[id_].end)]
+        return lane[:1]
+
+    def start_layer(self):
+        started = []
+        while not started and self.layer < len(self.layers):
+            self.lanes = [list(lane) for lane in self.layers[self.layer]]
+            for lane in self.lanes:
+                started += self.next_in_lane(lane)
+            if not started:
+                self.layer += 1
+        if not started and self.env.blanks > 1 and not all(agent.end for agent in self.env.by_id.values()):
+            # Fin de passe : les tuiles délogées depuis leur arrivée reprennent leur tour, comme avec SequentialTurns
+            self.layer = 0
+            self.late = True
+            return self.start_layer()
+        return started
+
+    def start(self):
+        self.layer = 0
+        self.late = False
+        return self.start_layer()
+
+    def end_turn(self, agent):
+        for lane in self.lanes:
+            if lane and lane[0] == agent.id:
+                lane.pop(0)
+                started = self.next_in_lane(lane)
+                if started or any(self.lanes):
+                    return started
+                self.layer += 1
+                return self.start_layer()
+        return []
@@ -1,4 +1,12 @@
+from array import array
+from functools import lru_cache
+from operator import add
+
+
 class PositionManager:
+    # Au-delà, la table complète n²×n² devient trop lourde : on garde des lignes en cache
+    DISTANCE_TABLE_MAX_N = 50
+
     @staticmethod
     def pos_2D(pos, n):
         return pos % n, pos // n
@@ -7,45 +15,112 @@ class PositionManager:
     def pos_1D(pos_x, pos_y, n):
         return pos_y * n + pos_x
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_coordinates_table(n):
+        return tuple((pos % n, pos // n) for pos in range(n * n))
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_neighbors_table(n):
+        table = []
+        for pos in range(n * n):
+            neighbors = []
+            if pos // n > 0:
+                neighbors.append(pos - n)  # Nord
+            if pos % n < n - 1:
+                neighbors.append(pos + 1)  # Est
+            if pos // n < n - 1:
+                neighbors.append(pos + n)  # Sud
+            if pos % n > 0:
+                neighbors.append(pos - 1)  # Ouest
+            table.append(tuple(neighbors))
+        return tuple(table)
+
+    @staticmethod
+    def get_distance_typecode(n):
+        # Une distance de Manhattan vaut au plus 2(n-1) : au-delà de 255, un octet ne suffit plus
+        return "B" if 2 * (n - 1) < 256 else "H"
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_axis_distances(n):
+        size = n * n
+        typecode = PositionManager.get_distance_typecode(n)
+        dx = tuple(array(typecode, [abs(pos % n - x) for pos in range(size)]) for x in range(n))
+        dy = tuple(array(typecode, [abs(pos // n - y) for pos in range(size)]) for y in range(n))
+        return dx, dy
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def build_distance_row(source, n):
+        dx, dy = PositionManager.get_axis_distances(n)
+        return array(PositionManager.get_distance_typecode(n), map(add, dx[source % n], dy[source // n]))
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_distance_table(n):
+        if n > PositionManager.DISTANCE_TABLE_MAX_N:
+            return None
+        dx, dy = PositionManager.get_axis_distances(n)
+        return memoryview(b"".join(bytes(map(add, dx[pos % n], dy[pos // n])) for pos in range(n * n)))
+
+    @staticmethod
+    def get_distance_row(source, n):
+        table = PositionManager.get_distance_table(n)
+        if table is None:
+            return PositionManager.build_distance_row(source, n)
+        size = n * n
+        return table[source * size:(source + 1) * size]
+
     @staticmethod
     def get_distance(pos_a, pos_b, n):
-        pos_a = PositionManager.pos_2D(pos_a, n)
-        pos_b = PositionManager.pos_2D(pos_b, n)
+        table = PositionManager.get_distance_table(n)
+        if table is not None:
+            return table[pos_a * n * n + pos_b]
+        coordinates = PositionManager.get_coordinates_table(n)
+        pos_a = coordinates[pos_a]
+        pos_b = coordinates[pos_b]
         return abs(pos_b[0] - pos_a[0]) + abs(pos_b[1] - pos_a[1])
 
     @staticmethod
-    def get_closers_neighbors(source, target, n, get_neighbors):
-        neighbors = get_neighbors(source)
-        closers = []
-        for neighbor in neighbors:
-            if PositionManager.get_distance(neighbor, target, n) < PositionManager.get_distance(source, target, n):
-                closers.append(neighbor)
-        return closers
+    def get_distances(source, positions, n):
+        row = PositionManager.get_distance_row(source, n)
+        return [row[pos] for pos in positions]
 
     @staticmethod
-    def get_closers_among(source, target, n, neighbors):
-        closers = []
-        dist_min = 1
-        for neighbor in neighbors:
-            dist = PositionManager.get_distance(neighbor, target, n) - PositionManager.get_distance(source, target, n)
-            if dist < dist_min:
-                dist_min = dist
-                closers = [neighbor]
-            elif dist == dist_min:
-                closers.append(neighbor)
-        return closers
+    def get_closers_neighbors(source, target, n, get_neighbors):
+        row = PositionManager.get_distance_row(target, n)
+        dist_source = row[source]
+        return [neighbor for neighbor in get_neighbors(source) if row[neighbor] < dist_source]
 
     @staticmethod
     def get_closers_empty(source, n, is_empty):
+        # Parcours de tout le plateau ; l'environnement passe par son EmptyIndex (Environment.get_closers_empty)
+        row = PositionManager.get_distance_row(source, n)
         closers = []
         dist_min = n * n
-
         for pos in range(n * n):
             if is_empty(pos):
-                dist = PositionManager.get_distance(source, pos, n)
+                dist = row[pos]
                 if dist < dist_min:
                     dist_min = dist
                     closers = [pos]
                 elif dist == dist_min:
                     closers.append(pos)
         return closers
+
+    @staticmethod
+    def get_closers_among(source, target, n, neighbors):
+        row = PositionManager.get_distance_row(target, n)
+        dist_source = row[source]
+        closers = []
+        dist_min = 1
+        for neighbor in neighbors:
+            dist = row[neighbor] - dist_source
+            if dist < dist_min:
+                dist_min = dist
+                closers = [neighbor]
+            elif dist == dist_min:
+                closers.append(neighbor)
+        return closers
@@ -0,0 +1,216 @@
+import argparse
+import random
+import time
+from functools import lru_cache
+import numpy as np
+from heuristics import LinearConflictHeuristic
+from solver import Solver, UnsolvableException, SearchTimeoutException, BeamExhaustedException, is_solvable, \
+    random_board
+from utils import PositionManager as PosMan
+
+
+class BatchedBoards:
+    # Un plateau par ligne d'une matrice ; la case vide vaut n * n - 1 pour indexer directement les tables
+    LINE_CONFLICT_MAX_N = 6  # Table de (n + 1) ** n entrées par ligne
+
+    def __init__(self, n):
+        self.n = n
+        cells = n * n
+        self.cells = cells
+        self.blank = cells - 1
+        self.dtype = np.int8 if cells <= 128 else np.int16
+        self.positions = np.arange(cells)
+        distances = np.zeros((cells, cells), dtype=np.int16)
+        table = PosMan.get_distance_table(n)
+        for tile in range(cells - 1):
+            distances[tile] = [PosMan.get_distance(tile, pos, n) if table is None else table[tile * cells + pos]
+                               for pos in range(cells)]
+        self.distances = distances
+        # Ligne et colonne cibles de chaque tuile ; -1 pour la case vide qui n'appartient à aucune ligne
+        self.goal_rows = np.array([tile // n for tile in range(cells - 1)] + [-1])
+        self.goal_cols = np.array([tile % n for tile in range(cells - 1)] + [-1])
+        self.cell_rows = self.positions // n
+        self.cell_cols = self.positions % n
+        self.conflicts = BatchedBoards.line_conflicts(n) if n <= self.LINE_CONFLICT_MAX_N else None
+        self.powers = (n + 1) ** np.arange(n)
+        moves = np.full((cells, 4), -1, dtype=np.int32)
+        for pos, neighbors in enumerate(PosMan.get_neighbors_table(n)):
+            moves[pos, :len(neighbors)] = neighbors
+        self.moves = moves
+        self.zobrist = np.random.default_rng(n).integers(0, 2 ** 63, size=(cells, cells), dtype=np.uint64)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def line_conflicts(n):
+        # Valeur de conflit linéaire de toutes les lignes possibles : chaque case vaut la position cible
+        # d'une tuile de la ligne (0..n-1) ou n pour une tuile étrangère
+        table = np.zeros((n + 1) ** n, dtype=np.int8)
+        for index in range(len(table)):
+            line = []
+            code = index
+            for _ in range(n):
+                if code % (n + 1) < n:
+                    line.append(code % (n + 1))
+                code //= n + 1
+            table[index] = LinearConflictHeuristic.conflicts(line)
+        return table
+
+    def encode(self, boards):
+        states = np.array(boards, dtype=self.dtype)
+        states[states < 0] = self.blank
+        return states
+
+    def decode(self, state):
+        return tuple(-1 if tile == self.blank else int(tile) for tile in state)
+
+    def heuristic(self, states):
+        states = states.astype(np.intp)
+        h = self.distances[states, self.positions].sum(axis=1, dtype=np.int32)
+        if self.conflicts is not None:
+            n = self.n
+            rows = np.where(self.goal_rows[states] == self.cell_rows, self.goal_cols[states], n)
+            cols = np.where(self.goal_cols[states] == self.cell_cols, self.goal_rows[states], n)
+            rows = rows.reshape(-1, n, n) @ self.powers
+            cols = cols.reshape(-1, n, n).transpose(0, 2, 1) @ self.powers
+            h += self.conflicts[rows].sum(axis=1, dtype=np.int32) + self.conflicts[cols].sum(axis=1, dtype=np.int32)
+        return h
+
+    def hashes(self, states):
+        return np.bitwise_xor.reduce(self.zobrist[states.astype(np.intp), self.positions], axis=1)
+
+    def expand(self, states, blanks):
+        # Tous les successeurs d'une couche : (plateaux, cases vides, indice du parent, tuile déplacée)
+        targets = self.moves[blanks]
+        parents, directions = np.nonzero(targets >= 0)
+        new_blanks = targets[parents, directions]
+        old_blanks = blanks[parents]
+        children = states[parents]
+        rows = np.arange(len(children))
+        tiles = children[rows, new_blanks]
+        children[rows, old_blanks] = tiles
+        children[rows, new_blanks] = self.blank
+        return children, new_blanks, parents, tiles
+
+
+class BeamSearch:
+    WIDTH = 2000
+    MAX_DEPTH = 2000
+
+    def __init__(self, n, width=WIDTH):
+        self.n = n
+        self.width = width
+        self.boards = BatchedBoards(n)
+        self.expanded = 0
+        self.generated = 0
+
+    def solve(self, board, timeout=None, max_depth=MAX_DEPTH):
+        n = self.n
+        if len(board) != n * n or sorted(board) != [-1] + list(range(n * n - 1)):
+            raise ValueError("board must hold tiles 0..%i and one blank (-1)" % (n * n - 2))
+        if not is_solvable(board, n):
+            raise UnsolvableException
+        boards = self.boards
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.expanded = self.generated = 0
+
+        states = boards.encode([board])
+        blanks = np.array([board.index(-1)])
+        h = boards.heuristic(states)
+        visited = boards.hashes(states)
+        layers = []  # (parents, tiles, destinations) des états gardés à chaque profondeur
+        depth = 0
+        while not len(states) or h.min() > 0:
+            # Couche vide : tous les enfants avaient déjà été visités
+            if depth == max_depth or not len(states):
+                raise BeamExhaustedException
+            if deadline is not None and time.monotonic() > deadline:
+                raise SearchTimeoutException
+            self.expanded += len(states)
+            children, child_blanks, parents, tiles = boards.expand(states, blanks)
+            self.generated += len(children)
+
+            # Doublons de la couche puis états déjà visités, sans boucle Python
+            keys = boards.hashes(children)
+            keys, unique = np.unique(keys, return_index=True)
+            found = np.searchsorted(visited, keys)
+            fresh = visited[np.minimum(found, len(visited) - 1)] != keys
+            keep = unique[fresh]
+            child_h = boards.heuristic(children[keep])
+            if len(keep) > self.width:
+                best = np.argpartition(child_h, self.width)[:self.width]
+                keep, child_h = keep[best], child_h[best]
+            # Deux suites triées : le tri stable (timsort) se réduit à une fusion linéaire
+            visited = np.concatenate((visited, keys[fresh]))
+            visited.sort(kind="stable")
+
+            layers.append((parents[keep], tiles[keep], blanks[parents[keep]]))
+            states, blanks, h = children[keep], child_blanks[keep], child_h
+            depth += 1
+
+        index = int(np.argmin(h))
+        moves = []
+        for parents, tiles, destinations in reversed(layers):
+            moves.append((int(tiles[index]), int(destinations[index])))
+            index = parents[index]
+        moves.reverse()
+        return moves
+
+
+def scalar_rate(n, states, seconds):
+    heuristic = LinearConflictHeuristic(n)
+    boards = [tuple(-1 if tile == n * n - 1 else int(tile) for tile in state) for state in states]
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for board in boards:
+            heuristic.evaluate(board)
+        count += len(boards)
+    return count / (time.perf_counter() - start)
+
+
+def scalar_search_rate(n, board, seconds):
+    # Débit de référence : IDA* scalaire avec la même heuristique, interrompu après quelques secondes
+    solver = Solver(n, LinearConflictHeuristic(n))
+    start = time.perf_counter()
+    try:
+        solver.solve(board, seconds)
+    except SearchTimeoutException:
+        pass
+    return solver.expanded / (time.perf_counter() - start)
+
+
+def batched_rate(boards, states, seconds):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        boards.heuristic(states)
+        count += len(states)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Beam search over NumPy batches, with heuristic throughput")
+    parser.add_argument("n", type=int)
+    parser.add_argument("--boards", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=BeamSearch.WIDTH)
+    parser.add_argument("--timeout", type=float, help="seconds per board")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    search = BeamSearch(args.n, args.width)
+    sample = search.boards.encode([random_board(args.n, rng) for _ in range(4096)])
+    print("heuristic: scalar %.0f boards/s, batched %.0f boards/s" % (
+        scalar_rate(args.n, sample[:256], 1.0), batched_rate(search.boards, sample, 1.0)))
+    print("search: scalar IDA* %.0f nodes/s" % scalar_search_rate(args.n, random_board(args.n, rng), 2.0))
+    for i in range(args.boards):
+        board = random_board(args.n, rng)
+        start = time.perf_counter()
+        try:
+            moves = search.solve(board, args.timeout)
+            status = "%i moves" % len(moves)
+        except (SearchTimeoutException, BeamExhaustedException) as exception:
+            status = type(exception).__name__
+        elapsed = time.perf_counter() - start
+        print("board %i: %s, %i nodes expanded, %.0f nodes/s, %.0f generated/s" % (
+            i, status, search.expanded, search.expanded / elapsed, search.generated / elapsed))